@@ -0,0 +1,193 @@
+"""Pre-aggregated operational metrics for the staff Analytics section."""
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+from datetime import datetime, timedelta
+
+from db import fetch_all
+from ledger import EXPIRED_STATUS
+from selar_reconcile import SELAR_TIMEZONE
+
+RENTAL_COLUMNS = "id, book_id, created_at, updated_at, delivery_type, delivery_status, is_paid"
+REBUILD_PAGE_SIZE = 1000
+RETURNED_STATUS = "Returned & Completed"
+ROLLUP_DAYS = 30
+# Days are counted in the business's local time, the same clock Selar reports in
+ROLLUP_TIMEZONE = SELAR_TIMEZONE
+
+# What one rental currently contributes to the counters
+_Rental = namedtuple("_Rental", "day method status paid amount turnaround updated_at")
+
+
+def _method(delivery_type):
+    return "Home Delivery" if "Home Delivery" in (delivery_type or "") else "Pickup"
+
+
+def fetch_rentals(client, page_size=REBUILD_PAGE_SIZE):
+    """Read every rental, only the columns the counters need, in id-keyset pages."""
+    return fetch_all(lambda: client.table("lib_rentals").select(RENTAL_COLUMNS), page_size)
+
+
+class OperationalMetrics:
+    """Running totals and daily rollups over rentals and inventory.
+
+    Each rental's contribution is remembered, so an insert or status change
+    swaps the old contribution for the new one in O(1). ``apply_rentals()`` is
+    registered with the change feed and ``apply_catalog()`` with the
+    ``CatalogCache``; ``rebuild()`` re-reads the ledger once when the counters
+    are first needed or staff ask for it. ``price(rental)`` is what a rental
+    earns once paid.
+    """
+
+    def __init__(self, price):
+        self.price = price
+        self.built_at = None
+        self.catalog_version = -1
+        self._rentals = {}
+        self._books = {}
+        self._lock = threading.RLock()
+        self._reset_rental_totals()
+        self._genre_status = defaultdict(Counter)
+
+    @property
+    def built(self):
+        return self.built_at is not None
+
+    def _reset_rental_totals(self):
+        self._days = defaultdict(Counter)
+        self._methods = Counter()
+        self._statuses = Counter()
+        self._unpaid = Counter()
+        self._turnaround = Counter()
+
+    def _contribute(self, rental, sign):
+        day = self._days[rental.day]
+        day["bookings"] += sign
+        day[rental.method] += sign
+        self._methods[rental.method] += sign
+        self._statuses[rental.status] += sign
+        if rental.status == EXPIRED_STATUS:
+            return
+        if rental.paid:
+            day["revenue"] += sign * rental.amount
+        else:
+            self._unpaid["rentals"] += sign
+            self._unpaid["amount"] += sign * rental.amount
+        if rental.turnaround is not None:
+            self._turnaround["rentals"] += sign
+            self._turnaround["seconds"] += sign * rental.turnaround
+
+    def _state(self, row, previous):
+        status = row["delivery_status"]
+        turnaround = None
+        if status == RETURNED_STATUS:
+            if previous is not None and previous.status == RETURNED_STATUS:
+                # Keep the first return time; a later edit moves updated_at again
+                turnaround = previous.turnaround
+            elif row.get("updated_at"):
+                booked = datetime.fromisoformat(row["created_at"])
+                turnaround = (datetime.fromisoformat(row["updated_at"]) - booked).total_seconds()
+        return _Rental(
+            day=datetime.fromisoformat(row["created_at"]).astimezone(ROLLUP_TIMEZONE).date().isoformat(),
+            method=_method(row.get("delivery_type")),
+            status=status,
+            paid=bool(row.get("is_paid")),
+            amount=self.price(row),
+            turnaround=turnaround,
+            updated_at=row.get("updated_at"),
+        )
+
+    def apply_rentals(self, rows):
+        """Fold inserted or changed ``lib_rentals`` rows into the counters.
+
+        A row older than the one already counted (by ``updated_at``) is ignored,
+        so the same change may arrive from the write path and the change feed.
+        """
+        with self._lock:
+            for row in rows:
+                previous = self._rentals.get(row["id"])
+                if previous is not None and previous.updated_at and row.get("updated_at") and row["updated_at"] < previous.updated_at:
+                    continue
+                rental = self._state(row, previous)
+                if previous is not None:
+                    self._contribute(previous, -1)
+                self._contribute(rental, 1)
+                self._rentals[row["id"]] = rental
+
+    def apply_catalog(self, event, rows, version):
+        """``CatalogCache`` listener: per-genre shelf status counts."""
+        with self._lock:
+            if event == "reset":
+                self._books.clear()
+                self._genre_status.clear()
+            for row in rows:
+                previous = self._books.get(row["id"])
+                if previous is not None:
+                    self._genre_status[previous[0]][previous[1]] -= 1
+                book = (row.get("genre"), row.get("status"))
+                self._genre_status[book[0]][book[1]] += 1
+                self._books[row["id"]] = book
+            self.catalog_version = version
+
+    def rebuild(self, client):
+        """Recount everything from one read of the ledger; O(rentals)."""
+        rows = fetch_rentals(client)
+        with self._lock:
+            previous = self._rentals
+            self._rentals = {}
+            self._reset_rental_totals()
+            self.apply_rentals(rows)
+            # Changes the feed applied while the ledger was being read are newer; keep them
+            for rental_id, rental in previous.items():
+                current = self._rentals.get(rental_id)
+                if current is None or (rental.updated_at and current.updated_at and rental.updated_at > current.updated_at):
+                    if current is not None:
+                        self._contribute(current, -1)
+                    self._contribute(rental, 1)
+                    self._rentals[rental_id] = rental
+            self.built_at = time.time()
+
+    def summary(self):
+        """Headline figures; cost does not depend on the number of rentals."""
+        with self._lock:
+            genres = {}
+            for genre, statuses in self._genre_status.items():
+                total = sum(statuses.values())
+                if total:
+                    genres[genre] = {
+                        "books": total,
+                        "reserved": statuses["Reserved"],
+                        "rented": statuses["Rented"],
+                        "off_shelf": total - statuses["Available"],
+                        "utilization": (total - statuses["Available"]) / total,
+                    }
+            shelved = sum(g["books"] for g in genres.values())
+            return {
+                "rentals": sum(self._methods.values()),
+                "method_mix": dict(self._methods),
+                "statuses": {status: n for status, n in self._statuses.items() if n},
+                "unpaid_rentals": self._unpaid["rentals"],
+                "unpaid_amount": self._unpaid["amount"],
+                "avg_turnaround_days": (
+                    self._turnaround["seconds"] / self._turnaround["rentals"] / 86400 if self._turnaround["rentals"] else None
+                ),
+                "utilization": sum(g["off_shelf"] for g in genres.values()) / shelved if shelved else 0.0,
+                "genres": genres,
+            }
+
+    def daily(self, days=ROLLUP_DAYS, today=None):
+        """Per-day bookings, revenue and pickup/delivery split for the last ``days`` local days."""
+        today = today or datetime.now(ROLLUP_TIMEZONE).date()
+        with self._lock:
+            rows = []
+            for offset in range(days - 1, -1, -1):
+                day = (today - timedelta(days=offset)).isoformat()
+                counts = self._days.get(day, Counter())
+                rows.append({
+                    "day": day,
+                    "bookings": counts["bookings"],
+                    "revenue": counts["revenue"],
+                    "pickup": counts["Pickup"],
+                    "delivery": counts["Home Delivery"],
+                })
+            return rows
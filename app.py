@@ -1,10 +1,20 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta
-from supabase import create_client
-import qrcode
-from io import BytesIO
+from datetime import datetime
 import os
+from db import get_database
+from perf import Metrics, configure_log
+from catalog import CatalogCache, fetch_catalog, GENRES, CONDITIONS
+from search_index import SearchIndex
+from checkout import build_rentals, fetch_checkout_books, find_member, reserve_books
+from loader import DataLoader
+from labels import qr_png, render_qr_batch, label_sheets_pdf, label_sheets_zip
+from bulk_import import book_key, import_books, iter_upload
+from covers import CoverCache
+from realtime_sync import ChangeFeed
+from analytics import OperationalMetrics
+from selar_reconcile import confirm_payments, fetch_pending, match_payments, read_payments
+from ledger import ALL_STATUSES, ACTIVE_STATUSES, UPDATE_STATUSES, fetch_ledger_page, format_ledger, ledger_options, patch_ledger_page
 
 # --- 1. CONFIG & BRANDING ---
 st.set_page_config(page_title="Nova Digital Library", page_icon="assets/favicon.png", layout="wide")
@@ -90,26 +100,159 @@ st.markdown("""
 try:
     SUPABASE_URL = st.secrets["supabase"]["url"]
     SUPABASE_KEY = st.secrets["supabase"]["key"]
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    supabase = get_database(
+        SUPABASE_URL, SUPABASE_KEY,
+        timeout=st.secrets["supabase"].get("timeout", 10),
+        retries=st.secrets["supabase"].get("retries", 3),
+    )
 except KeyError:
     st.error("🚨 Secrets Error: Could not find [supabase] credentials in .streamlit/secrets.toml")
     st.stop()
 
+@st.cache_resource
+def get_catalog_cache():
+    cache_config = st.secrets.get("cache", {})
+    return CatalogCache(ttl=cache_config.get("catalog_ttl", 60), max_age=cache_config.get("catalog_max_age", 900))
+
+catalog_cache = get_catalog_cache()
+
+@st.cache_resource
+def get_search_index():
+    index = SearchIndex()
+    catalog_cache.subscribe(index.apply)
+    return index
+
+search_index = get_search_index()
+
+@st.cache_resource
+def get_metrics():
+    perf_config = st.secrets.get("perf", {})
+    configure_log(perf_config.get("log_path"))
+    return Metrics(
+        slow_query_seconds=perf_config.get("slow_query_ms", 500) / 1000,
+        metrics_path=perf_config.get("metrics_path"),
+    )
+
+metrics = get_metrics()
+supabase.recorder = metrics
+
+@st.cache_resource
+def get_loader():
+    return DataLoader()
+
+loader = get_loader()
+
+@st.cache_resource
+def get_cover_cache():
+    return CoverCache(max_bytes=st.secrets.get("cache", {}).get("cover_cache_mb", 50) * 1024 * 1024)
+
+cover_cache = get_cover_cache()
+
+@st.cache_resource
+def get_change_feed():
+    sync_config = st.secrets.get("sync", {})
+    feed = ChangeFeed(supabase, catalog_cache, poll_seconds=sync_config.get("poll_seconds", 5))
+    if sync_config.get("enabled", True):
+        feed.start()
+    else:
+        feed.available = False
+    return feed
+
+change_feed = get_change_feed()
+
+def load_catalog():
+    return fetch_catalog(supabase)
+
 if 'cart' not in st.session_state:
     st.session_state.cart = []
 if 'is_admin' not in st.session_state:
     st.session_state.is_admin = False
 
 def get_qr(book_id):
-    qr_url = f"https://aicon-library.streamlit.app/?id={book_id}"
-    qr = qrcode.make(qr_url)
-    buf = BytesIO()
-    qr.save(buf, format="PNG")
-    return buf.getvalue()
+    return qr_png(book_id)
 
 def get_rental_price(book_data):
     return 1500  
 
+SELAR_LINK = "https://selar.com/d20is52cl1"
+
+@st.cache_resource
+def get_ops_metrics():
+    ops = OperationalMetrics(price=get_rental_price)
+    catalog_cache.subscribe(ops.apply_catalog)
+    change_feed.subscribe("lib_rentals", ops.apply_rentals)
+    return ops
+
+ops_metrics = get_ops_metrics()
+
+def show_reservation_result(result, books, success_message):
+    titles = {str(b['id']): b['title'] for b in books}
+    conflicts = {str(book_id) for book_id in result.conflicts}
+    if conflicts:
+        # Another session won these copies; mark just them taken rather than reloading the whole catalog
+        catalog_cache.patch(result.conflicts, {"status": "Reserved"})
+        st.session_state.cart = [i for i in st.session_state.cart if str(i) not in conflicts]
+        taken = ', '.join(titles.get(book_id, book_id) for book_id in conflicts)
+        if not result.rentals:
+            st.error(f"🚨 Another reader just reserved: {taken}. Nothing was reserved, please review your selection.")
+            return
+        st.warning(f"⚠️ Another reader just reserved: {taken}. The rest of your selection is secured.")
+    
+    catalog_cache.patch(result.reserved_ids, {"status": "Reserved"})
+    ops_metrics.apply_rentals(result.rentals)
+    st.session_state.cart = []
+    reserved = {str(book_id) for book_id in result.reserved_ids}
+    total_price = sum(get_rental_price(b) for b in books if str(b['id']) in reserved)
+    st.success(success_message)
+    st.info(f"⚠️ Note: Please adjust the quantity to **{len(reserved)}** on the Selar checkout page to total ₦{total_price:,.2f}.")
+    st.markdown(f'<a href="{SELAR_LINK}" target="_blank"><button style="width:100%; background-color:#5B21B6; color:white; padding:14px; border:none; border-radius:8px; font-weight:bold; cursor:pointer;">💳 Pay ₦{total_price:,.2f} via Selar</button></a>', unsafe_allow_html=True)
+
+GALLERY_PAGE_SIZE = 12
+
+def session_data(key, loader):
+    # Per-session memo for section data; key[0] names the group invalidate_session_data() drops
+    store = st.session_state.setdefault('section_data', {})
+    if key not in store:
+        store[key] = loader()
+    return store[key]
+
+def invalidate_session_data(group):
+    store = st.session_state.get('section_data', {})
+    for key in [k for k in store if k[0] == group]:
+        del store[key]
+
+def sync_ledger_page(key, cursor, query):
+    # Fold change-feed deltas into the cached ledger page instead of re-reading it
+    store = st.session_state.get('section_data', {})
+    version = change_feed.version
+    changes = change_feed.changes_since(st.session_state.get('ledger_synced', version), "lib_rentals")
+    st.session_state.ledger_synced = version
+    if changes == []:
+        return
+    page = store.get(key)
+    patched = None if page is None or changes is None else patch_ledger_page(page[0], changes, cursor, page[1], **query)
+    # Other pages, cached or prefetched, are not patched, so they are read again when staff page to them
+    invalidate_session_data("ledger")
+    loader.discard("ledger")
+    if patched is not None:
+        store[key] = (patched[0], page[1])
+
+@st.fragment(run_every=change_feed.poll_seconds)
+def watch_changes():
+    # Rerun this session only when a row it is showing has changed
+    view = st.session_state.get('sync_view')
+    if view is None or view[1] == change_feed.version:
+        return
+    table, since, ids, statuses = view
+    changes = change_feed.changes_since(since, table)
+    if changes is None or any(str(r['id']) in ids or r.get('delivery_status') in statuses for r in changes):
+        st.rerun()
+    st.session_state.sync_view = (table, change_feed.version, ids, statuses)
+
+def show_more_books(genre):
+    limits = st.session_state.gallery_limits
+    limits[genre] = limits.get(genre, GALLERY_PAGE_SIZE) + GALLERY_PAGE_SIZE
+
 # ==========================================
 # 🚦 TRAFFIC CONTROLLER (DYNAMIC ROUTING)
 # ==========================================
@@ -123,104 +266,90 @@ if scanned_book_id:
 elif is_checkout_mode and st.session_state.cart:
     checkout_ids = st.session_state.cart
 
+metrics.begin_rerun("checkout" if checkout_ids else "dashboard")
+
 if checkout_ids:
     # ---------------------------------------------------------
     # ROUTE A: EXPRESS CHECKOUT 
     # ---------------------------------------------------------
     st.markdown("## 📱 Nova Secure Checkout")
     
-    try:
-        res = supabase.table("lib_inventory").select("*").in_("id", checkout_ids).execute()
+    with metrics.phase("express_checkout"):
+        try:
+            # Both reads start now; the member lookup only when "Verify" was just clicked
+            books_future = loader.future(("checkout", tuple(checkout_ids)), lambda: fetch_checkout_books(supabase, checkout_ids))
+            member_email = st.session_state.get("member_email", "").strip().lower()
+            member_future = None
+            if member_email and st.session_state.get("verify_elite"):
+                member_future = loader.submit(find_member, supabase, member_email)
+            books = books_future.result()
         
-        if res.data:
-            books = res.data
-            total_price = sum(get_rental_price(b) for b in books)
-            selar_link = "https://selar.com/d20is52cl1" 
+            if books:
+                total_price = sum(get_rental_price(b) for b in books)
             
-            with st.container(border=True):
-                st.markdown("### 🛒 Your Selection")
-                for b in books:
-                    st.markdown(f"- **{b['title']}** - ₦{get_rental_price(b):,.2f}")
-                st.markdown(f"#### **Total Amount: ₦{total_price:,.2f}**")
+                with st.container(border=True):
+                    st.markdown("### 🛒 Your Selection")
+                    for b in books:
+                        st.markdown(f"- **{b['title']}** - ₦{get_rental_price(b):,.2f}")
+                    st.markdown(f"#### **Total Amount: ₦{total_price:,.2f}**")
             
-            unavailable_books = [b['title'] for b in books if b['status'] != "Available"]
-            if unavailable_books:
-                st.error(f"🚨 Cannot proceed. The following books are no longer available: {', '.join(unavailable_books)}")
-            else:
-                st.markdown("### Choose Your Delivery Method")
-                rental_method = st.radio(
-                    "Delivery Options:", 
-                    ["🚶 Standard (Library Pickup)", "🚚 Elite Member (Home Delivery)"],
-                    label_visibility="collapsed"
-                )
+                unavailable_books = [b['title'] for b in books if b['status'] != "Available"]
+                if unavailable_books:
+                    st.error(f"🚨 Cannot proceed. The following books are no longer available: {', '.join(unavailable_books)}")
+                else:
+                    st.markdown("### Choose Your Delivery Method")
+                    rental_method = st.radio(
+                        "Delivery Options:", 
+                        ["🚶 Standard (Library Pickup)", "🚚 Elite Member (Home Delivery)"],
+                        label_visibility="collapsed"
+                    )
+                    allow_partial = st.checkbox("If a book is taken while I check out, reserve the rest anyway")
                 
-                if "Elite" in rental_method:
-                    st.info("Your Elite Membership covers delivery fees! Verify your email to dispatch.")
-                    member_email = st.text_input("Registered Elite Email").strip().lower()
+                    if "Elite" in rental_method:
+                        st.info("Your Elite Membership covers delivery fees! Verify your email to dispatch.")
+                        member_email = st.text_input("Registered Elite Email", key="member_email").strip().lower()
                     
-                    if st.button("Verify & Generate Payment Link", type="primary", use_container_width=True):
-                        if member_email:
-                            member_check = supabase.table("lib_members").select("*").eq("email", member_email).execute()
-                            if member_check.data:
-                                member = member_check.data[0]
-                                for b in books:
-                                    pending_rental = {
-                                        "book_id": b['id'],
-                                        "member_id": member['id'],
-                                        "due_date": (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d'),
-                                        "delivery_type": "Home Delivery",
-                                        "delivery_status": "Pending Verification",
-                                        "is_paid": False
-                                    }
-                                    supabase.table("lib_rentals").insert(pending_rental).execute()
-                                    supabase.table("lib_inventory").update({"status": "Reserved"}).eq("id", b['id']).execute()
-                                
-                                st.session_state.cart = []
-                                st.success(f"Verified, {member['full_name']}! Ledger updated.")
-                                st.info(f"⚠️ Note: Please adjust the quantity to **{len(books)}** on the Selar checkout page to total ₦{total_price:,.2f}.")
-                                st.markdown(f'<a href="{selar_link}" target="_blank"><button style="width:100%; background-color:#5B21B6; color:white; padding:14px; border:none; border-radius:8px; font-weight:bold; cursor:pointer;">💳 Pay ₦{total_price:,.2f} via Selar</button></a>', unsafe_allow_html=True)
+                        if st.button("Verify & Generate Payment Link", type="primary", use_container_width=True, key="verify_elite"):
+                            if member_email:
+                                member = member_future.result() if member_future else find_member(supabase, member_email)
+                                if member:
+                                    rentals = build_rentals(books, "Home Delivery", "Pending Verification", member_id=member['id'])
+                                    result = reserve_books(supabase, rentals, all_or_nothing=not allow_partial)
+                                    show_reservation_result(result, books, f"Verified, {member['full_name']}! Ledger updated.")
+                                else:
+                                    st.error("Email not found. Are you registered for the Elite tier?")
                             else:
-                                st.error("Email not found. Are you registered for the Elite tier?")
-                        else:
-                            st.warning("Please enter your email.")
-                else:
-                    st.info("Standard rentals must be picked up physically from the library desk.")
-                    guest_name = st.text_input("Enter your Name (for pickup reservation)")
+                                st.warning("Please enter your email.")
+                    else:
+                        st.info("Standard rentals must be picked up physically from the library desk.")
+                        guest_name = st.text_input("Enter your Name (for pickup reservation)")
                     
-                    if st.button("Reserve & Generate Payment Link", type="primary", use_container_width=True):
-                        if guest_name:
-                            for b in books:
-                                pending_rental = {
-                                    "book_id": b['id'],
-                                    "due_date": (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d'),
-                                    "delivery_type": f"Pickup by {guest_name}",
-                                    "delivery_status": "Awaiting Pickup",
-                                    "is_paid": False
-                                }
-                                supabase.table("lib_rentals").insert(pending_rental).execute()
-                                supabase.table("lib_inventory").update({"status": "Reserved"}).eq("id", b['id']).execute()
-                            
-                            st.session_state.cart = []
-                            st.success("Reservation logged! Books are secured for you.")
-                            st.info(f"⚠️ Note: Please adjust the quantity to **{len(books)}** on the Selar checkout page to total ₦{total_price:,.2f}.")
-                            st.markdown(f'<a href="{selar_link}" target="_blank"><button style="width:100%; background-color:#5B21B6; color:white; padding:14px; border:none; border-radius:8px; font-weight:bold; cursor:pointer;">💳 Pay ₦{total_price:,.2f} via Selar</button></a>', unsafe_allow_html=True)
-                        else:
-                            st.warning("Please provide a name for the pickup reservation.")
+                        if st.button("Reserve & Generate Payment Link", type="primary", use_container_width=True):
+                            if guest_name:
+                                rentals = build_rentals(books, f"Pickup by {guest_name}", "Awaiting Pickup")
+                                result = reserve_books(supabase, rentals, all_or_nothing=not allow_partial)
+                                show_reservation_result(result, books, "Reservation logged! Books are secured for you.")
+                            else:
+                                st.warning("Please provide a name for the pickup reservation.")
             
-            st.divider()
-            if st.button("← Back to Main Library", use_container_width=True):
-                st.query_params.clear()
-                st.rerun()
-        else:
-            st.error("🚨 Book(s) not found.")
-    except Exception as e:
-        st.error(f"Database connection error: {e}")
+                st.divider()
+                if st.button("← Back to Main Library", use_container_width=True):
+                    st.query_params.clear()
+                    st.rerun()
+            else:
+                st.error("🚨 Book(s) not found.")
+        except Exception as e:
+            st.error(f"Database connection error: {e}")
 
 else:
     # ---------------------------------------------------------
     # ROUTE B: THE DASHBOARD TABS 
     # ---------------------------------------------------------
     
+    # Reload an expired catalog in the background while the sidebar and section render
+    if not catalog_cache.is_fresh():
+        loader.submit(catalog_cache.get, load_catalog)
+    
     logo_path = "assets/logo.png"
     if os.path.exists(logo_path):
         st.sidebar.image(logo_path, use_container_width=True)
@@ -242,25 +371,44 @@ else:
                         st.error("Invalid Credentials")
         else:
             st.success("👑 Staff Mode Active")
+            cache_stats = catalog_cache.stats()
+            st.caption(f"Catalog cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%}) · v{cache_stats['version']}")
+            pool_stats = supabase.stats()
+            st.caption(f"Database: {pool_stats['requests']} requests · {pool_stats['retries']} retries · {pool_stats['failures']} failures · {pool_stats['avg_ms']:.0f} ms avg")
+            st.caption(f"Prefetch: {loader.prefetch_hits} hits / {loader.prefetch_misses} misses")
+            feed_stats = change_feed.stats()
+            st.caption(f"Change feed: {feed_stats['polls']} polls · {feed_stats['rows_applied']} rows applied · v{feed_stats['version']}" if feed_stats['available'] else "Change feed: off (catalog refreshes on its TTL)")
+            with st.expander("⏱️ Performance"):
+                perf_summary = metrics.summary()
+                for heading, rows in (("Phases", perf_summary["phases"]), ("Queries", perf_summary["queries"])):
+                    if rows:
+                        st.caption(heading)
+                        st.dataframe(
+                            pd.DataFrame([
+                                {"Name": name if isinstance(name, str) else " ".join(name), "Calls": r["count"], "Mean ms": round(r["mean"] * 1000, 1), "p95 ≤ ms": r["p95"] * 1000}
+                                for name, r in rows.items()
+                            ]),
+                            use_container_width=True, hide_index=True,
+                        )
+            if st.button("Refresh Catalog", use_container_width=True):
+                catalog_cache.invalidate()
+                st.rerun()
             if st.button("Lock Dashboard", use_container_width=True):
                 st.session_state.is_admin = False
+                st.session_state.pop('section_data', None)
                 st.rerun()
 
-    if st.session_state.is_admin:
-        tab_gallery, tab_member, tab_logistics, tab_admin = st.tabs([
-            "🖼️ The Collection", "👤 Join Elite", "🚚 Delivery Hub", "⚙️ Admin & Acquisitions"
-        ])
-    else:
-        tab_gallery, tab_member = st.tabs(["🖼️ The Collection", "👤 Join Elite"])
-        tab_logistics = None
-        tab_admin = None
-
     # --- 🖼️ TAB 1: ELITE GALLERY ---
-    with tab_gallery:
+    def render_gallery():
         st.markdown("### 📚 The Nova Collection")
+        synced = change_feed.version
+        shown_ids = set()
         
         # --- THE FLOATING MOBILE CART (F-String used safely here) ---
         if st.session_state.cart:
+            # Warm the checkout read so "Proceed to Secure Checkout" opens without waiting on it
+            cart = list(st.session_state.cart)
+            loader.prefetch(("checkout", tuple(cart)), lambda: fetch_checkout_books(supabase, cart))
             total = len(st.session_state.cart) * 1500
             st.markdown(f"""
             <div class="floating-cart">
@@ -270,39 +418,49 @@ else:
             """, unsafe_allow_html=True)
         # -----------------------------
 
-        response = supabase.table("lib_inventory").select("*").execute()
+        with metrics.phase("collection.catalog"):
+            df = catalog_cache.frame(load_catalog)
+            if search_index.version != catalog_cache.version:
+                search_index.build(catalog_cache.get(load_catalog), catalog_cache.version)
         
-        if response.data:
-            df = pd.DataFrame(response.data)
+        if not df.empty:
             col_search, col_filter = st.columns([3, 1])
             with col_search:
                 search_query = st.text_input("🔍 Search Title or Author", placeholder="Type to search...")
             with col_filter:
-                all_genres = ["All Categories"] + list(df['genre'].unique()) if 'genre' in df.columns else ["All Categories"]
-                selected_genre = st.selectbox("Genre Filter", all_genres)
+                genre_counts = search_index.genre_counts()
+                all_genres = ["All Categories"] + list(genre_counts)
+                selected_genre = st.selectbox(
+                    "Genre Filter", all_genres,
+                    format_func=lambda g: g if g == "All Categories" else f"{g} ({genre_counts.get(g, 0)})"
+                )
+                
+            filtered_df = df
+            if search_query or selected_genre != "All Categories":
+                with metrics.phase("collection.search"):
+                    genre_filter = None if selected_genre == "All Categories" else selected_genre
+                    ranked_ids = search_index.search(search_query, genre=genre_filter)
+                    rank = {book_id: pos for pos, book_id in enumerate(ranked_ids)}
+                    filtered_df = df[df['id'].isin(list(rank))]
+                    filtered_df = filtered_df.iloc[filtered_df['id'].map(rank).argsort()]
                 
-            filtered_df = df.copy()
-            if search_query:
-                filtered_df = filtered_df[
-                    filtered_df['title'].str.contains(search_query, case=False) | 
-                    filtered_df['author'].str.contains(search_query, case=False)
-                ]
-            if selected_genre != "All Categories":
-                filtered_df = filtered_df[filtered_df['genre'] == selected_genre]
+            # Each genre shows one page of cards; a new search starts from page one again
+            if st.session_state.get('gallery_query') != (search_query, selected_genre):
+                st.session_state.gallery_query = (search_query, selected_genre)
+                st.session_state.gallery_limits = {}
                 
             if not filtered_df.empty:
-                active_genres = filtered_df['genre'].unique()
-                for genre in active_genres:
+                for genre, genre_books in filtered_df.groupby('genre', sort=False, dropna=False):
+                    limit = st.session_state.gallery_limits.get(genre, GALLERY_PAGE_SIZE)
                     st.markdown(f"#### {genre}")
                     st.divider()
-                    genre_books = filtered_df[filtered_df['genre'] == genre]
                     
                     cols = st.columns(4)
-                    for idx, row in genre_books.reset_index().iterrows():
+                    for idx, row in genre_books.head(limit).reset_index().iterrows():
                         with cols[idx % 4]:
+                            shown_ids.add(str(row['id']))
                             with st.container(border=True):
-                                cover = row.get('cover_url') if row.get('cover_url') else "https://via.placeholder.com/200x300?text=No+Cover"
-                                st.image(cover, use_container_width=True)
+                                st.image(cover_cache.thumbnail(row.get('cover_url')), use_container_width=True)
                                 st.markdown(f"**{row['title']}**")
                                 st.caption(f"_{row['author']}_")
                                 
@@ -324,13 +482,18 @@ else:
                                 else:
                                     st.markdown(":red[● Rented Out]")
                                     st.button("Unavailable", key=f"btn_u_{row['id']}", disabled=True, use_container_width=True)
+                    
+                    remaining = len(genre_books) - limit
+                    if remaining > 0:
+                        st.button(f"Load more {genre} ({remaining} more)", key=f"more_{genre}", on_click=show_more_books, args=(genre,), use_container_width=True)
             else:
                 st.info("No books found matching your search.")
+            st.session_state.sync_view = ("lib_inventory", synced, shown_ids, ())
         else:
             st.warning("📭 The Library is currently empty.")
 
     # --- 👤 TAB 2: MEMBER ONBOARDING ---
-    with tab_member:
+    def render_member():
         st.header("👤 Join the Nova Elite Readers")
         with st.form("new_member_form"):
             c1, c2 = st.columns(2)
@@ -354,108 +517,294 @@ else:
                     st.warning("Name and Email are required.")
 
     # --- 🚚 TAB 3: DELIVERY HUB (ADMIN ONLY) ---
-    if tab_logistics:
-        with tab_logistics:
+    def render_logistics():
+        h1, h2 = st.columns([4, 1])
+        with h1:
             st.header("🚚 Logistics & Payment Hub")
+        with h2:
+            if st.button("🔄 Refresh", use_container_width=True):
+                invalidate_session_data("ledger")
+                loader.discard("ledger")
+        if st.session_state.get('ledger_flash'):
+            st.success(st.session_state.pop('ledger_flash'))
+        
+        with st.expander("💳 Selar Payment Reconciliation"):
+            st.caption("Upload a Selar transaction export (CSV or XLSX). Payments are matched to unpaid reservations by email or name, amount and booking time.")
+            selar_upload = st.file_uploader("Selar Export", type=["csv", "xlsx"], key="selar_upload")
+            if st.button("Match Payments", disabled=selar_upload is None, use_container_width=True):
+                with st.spinner("Matching payments..."), metrics.phase("delivery_hub.selar_match"):
+                    payments, payment_errors = read_payments(selar_upload, selar_upload.name)
+                    st.session_state.selar_match = (match_payments(payments, fetch_pending(supabase), get_rental_price), payment_errors)
+            
+            selar_match = st.session_state.get('selar_match')
+            if selar_match:
+                match, payment_errors = selar_match
+                m1, m2, m3 = st.columns(3)
+                m1.metric("Matched", len(match.matched))
+                m2.metric("Ambiguous", len(match.ambiguous))
+                m3.metric("Unmatched", len(match.unmatched) + len(payment_errors))
+                for label, preview in (("✅ Matched", match.matched), ("⚠️ Ambiguous", match.ambiguous), ("❌ Unmatched", match.unmatched), ("🚫 Unreadable Rows", payment_errors)):
+                    if preview:
+                        st.caption(label)
+                        st.dataframe(pd.DataFrame(preview), use_container_width=True, hide_index=True)
+                if st.button(f"Confirm {len(match.rental_ids)} Rentals as Paid", type="primary", disabled=not match.rental_ids, use_container_width=True):
+                    confirmed = confirm_payments(supabase, match.rental_ids)
+                    ops_metrics.apply_rentals(confirmed)
+                    invalidate_session_data("ledger")
+                    loader.discard("ledger")
+                    st.session_state.selar_match = None
+                    st.session_state.ledger_flash = f"Payment confirmed for {len(confirmed)} rentals."
+                    st.rerun()
+        
+        f1, f2, f3 = st.columns([2, 1, 1])
+        with f1:
+            status_filter = st.multiselect("Status", ALL_STATUSES, default=ACTIVE_STATUSES)
+        with f2:
+            payment_filter = st.selectbox("Payment", ["All", "Pending Selar", "Paid"])
+        with f3:
+            booked_between = st.date_input("Booked Between", value=(), format="YYYY-MM-DD")
+        
+        ledger_filters = (tuple(status_filter), payment_filter, tuple(booked_between))
+        if st.session_state.get('ledger_filters') != ledger_filters:
+            # New filters start again from the newest page
+            st.session_state.ledger_filters = ledger_filters
+            st.session_state.ledger_cursors = [None]
+        
+        ledger_query = {
+            "statuses": status_filter or None,
+            "paid": {"All": None, "Paid": True, "Pending Selar": False}[payment_filter],
+            "date_from": booked_between[0] if len(booked_between) > 0 else None,
+            "date_to": booked_between[1] if len(booked_between) > 1 else None,
+        }
+        
+        def load_ledger_page(page_cursor):
+            return fetch_ledger_page(supabase, cursor=page_cursor, **ledger_query)
+        
+        try:
+            cursor = st.session_state.ledger_cursors[-1]
+            with metrics.phase("delivery_hub.ledger"):
+                sync_ledger_page(("ledger", ledger_filters, cursor), cursor, ledger_query)
+                rows, next_cursor = session_data(
+                    ("ledger", ledger_filters, cursor),
+                    lambda: loader.take(("ledger", ledger_filters, cursor), lambda: load_ledger_page(cursor)),
+                )
+            if next_cursor is not None:
+                # Staff usually page on; have the older page ready before they click
+                loader.prefetch(("ledger", ledger_filters, next_cursor), lambda: load_ledger_page(next_cursor))
+            st.session_state.sync_view = ("lib_rentals", st.session_state.ledger_synced, {str(r['id']) for r in rows}, set(status_filter or ALL_STATUSES))
             
-            try:
-                res = supabase.table("lib_rentals").select(
-                    "id, book_id, due_date, delivery_type, delivery_status, is_paid, lib_inventory(title), lib_members(full_name, phone)"
-                ).execute()
+            if rows:
+                df_log = format_ledger(rows)
                 
-                if res.data:
-                    formatted_data = []
-                    for r in res.data:
-                        book_title = r.get("lib_inventory", {}).get("title", "Unknown") if r.get("lib_inventory") else "Unknown"
-                        
-                        if r.get("lib_members"):
-                            customer = r["lib_members"].get("full_name", "Unknown")
-                            contact = r["lib_members"].get("phone", "N/A")
-                        else:
-                            customer = r.get("delivery_type", "Guest").replace("Pickup by ", "")
-                            contact = "Guest (No Phone)"
-                            
-                        formatted_data.append({
-                            "Ref ID": str(r["id"])[:8],
-                            "Book": book_title,
-                            "Customer": customer,
-                            "Contact": contact,
-                            "Method": "🚚 Delivery" if "Home Delivery" in r["delivery_type"] else "🚶 Pickup",
-                            "Payment": "✅ Paid" if r["is_paid"] else "⏳ Pending Selar",
-                            "Status": r["delivery_status"],
-                            "_raw_id": r["id"],
-                            "_book_id": r["book_id"]
-                        })
-                        
-                    df_log = pd.DataFrame(formatted_data)
+                st.dataframe(
+                    df_log.drop(columns=["_raw_id", "_book_id"]), 
+                    use_container_width=True, 
+                    hide_index=True
+                )
+                
+                p1, p2, p3 = st.columns([1, 2, 1])
+                with p1:
+                    if st.button("← Newer", disabled=len(st.session_state.ledger_cursors) == 1, use_container_width=True):
+                        st.session_state.ledger_cursors.pop()
+                        st.rerun()
+                with p2:
+                    st.caption(f"Page {len(st.session_state.ledger_cursors)} · {len(df_log)} rentals shown")
+                with p3:
+                    if st.button("Older →", disabled=next_cursor is None, use_container_width=True):
+                        st.session_state.ledger_cursors.append(next_cursor)
+                        st.rerun()
+                
+                st.divider()
+                st.subheader("⚙️ Dispatch & Update Desk")
+                
+                c1, c2 = st.columns(2)
+                with c1:
+                    options = ledger_options(df_log)
+                    selected_index = st.selectbox("Select Transaction", range(len(options)), format_func=lambda i: options[i])
                     
-                    st.dataframe(
-                        df_log.drop(columns=["_raw_id", "_book_id"]), 
-                        use_container_width=True, 
-                        hide_index=True
-                    )
+                    target_uuid = df_log.iloc[selected_index]["_raw_id"]
+                    target_book_id = df_log.iloc[selected_index]["_book_id"]
                     
-                    st.divider()
-                    st.subheader("⚙️ Dispatch & Update Desk")
+                with c2:
+                    new_status = st.selectbox("Update Status", UPDATE_STATUSES)
                     
-                    c1, c2 = st.columns(2)
-                    with c1:
-                        options = df_log.apply(lambda x: f"{x['Ref ID']} - {x['Customer']} ({x['Book']})", axis=1).tolist()
-                        selected_display = st.selectbox("Select Transaction", options)
-                        selected_index = options.index(selected_display)
-                        
-                        target_uuid = df_log.iloc[selected_index]["_raw_id"]
-                        target_book_id = df_log.iloc[selected_index]["_book_id"]
-                        
-                    with c2:
-                        new_status = st.selectbox(
-                            "Update Status", 
-                            [
-                                "Payment Confirmed - Awaiting Dispatch", 
-                                "In-Transit (Rider Dispatched)", 
-                                "Picked Up (Library Desk)", 
-                                "Returned & Completed"
-                            ]
-                        )
-                        
-                    if st.button("Commit Update", type="primary", use_container_width=True):
-                        update_payload = {"delivery_status": new_status}
-                        if "Payment Confirmed" in new_status:
-                            update_payload["is_paid"] = True
-                            
-                        supabase.table("lib_rentals").update(update_payload).eq("id", target_uuid).execute()
+                if st.button("Commit Update", type="primary", use_container_width=True):
+                    update_payload = {"delivery_status": new_status}
+                    if "Payment Confirmed" in new_status:
+                        update_payload["is_paid"] = True
                         
-                        if new_status in ["In-Transit (Rider Dispatched)", "Picked Up (Library Desk)"]:
-                            supabase.table("lib_inventory").update({"status": "Rented"}).eq("id", target_book_id).execute()
-                        elif new_status == "Returned & Completed":
-                            supabase.table("lib_inventory").update({"status": "Available"}).eq("id", target_book_id).execute()
-                            
-                        st.success(f"Ledger & Inventory updated!")
-                        st.info("🔄 Refresh the page to see the updated table.")
+                    res = supabase.table("lib_rentals").update(update_payload).eq("id", target_uuid).execute()
+                    ops_metrics.apply_rentals(res.data or [])
+                    
+                    if new_status in ["In-Transit (Rider Dispatched)", "Picked Up (Library Desk)"]:
+                        supabase.table("lib_inventory").update({"status": "Rented"}).eq("id", target_book_id).execute()
+                        catalog_cache.patch([target_book_id], {"status": "Rented"})
+                    elif new_status == "Returned & Completed":
+                        supabase.table("lib_inventory").update({"status": "Available"}).eq("id", target_book_id).execute()
+                        catalog_cache.patch([target_book_id], {"status": "Available"})
                         
-                else:
-                    st.info("✅ The ledger is clear.")
+                    invalidate_session_data("ledger")
+                    loader.discard("ledger")
+                    st.session_state.ledger_flash = "Ledger & Inventory updated!"
+                    st.rerun()
                     
-            except Exception as e:
-                st.error(f"Dashboard Integration Error: {e}")
+            elif status_filter == ACTIVE_STATUSES and payment_filter == "All" and not booked_between:
+                st.info("✅ The ledger is clear.")
+            else:
+                st.info("No rentals match these filters.")
+                
+        except Exception as e:
+            st.error(f"Dashboard Integration Error: {e}")
 
     # --- ⚙️ TAB 4: ADMIN & ACQUISITIONS (ADMIN ONLY) ---
-    if tab_admin:
-        with tab_admin:
-            st.header("📚 Catalog New Acquisition")
-            with st.form("add_book_form"):
-                col1, col2 = st.columns(2)
-                with col1:
-                    title = st.text_input("Book Title")
-                    author = st.text_input("Author")
-                with col2:
-                    genre = st.selectbox("Genre", ["Fiction", "Non-Fiction", "Sci-Fi", "History", "Children's Fantasy", "Education"])
-                    condition = st.select_slider("Condition", ["Fair", "Good", "Very Good", "New"])
-                cover_url = st.text_input("Cover Image URL")
-                if st.form_submit_button("Catalog Book", use_container_width=True):
-                    if title and author:
-                        book_data = {"title": title, "author": author, "genre": genre, "condition": condition, "cover_url": cover_url, "status": "Available"}
-                        res = supabase.table("lib_inventory").insert(book_data).execute()
-                        if res.data:
-                            st.success(f"'{title}' added to inventory!")
-                            st.image(get_qr(res.data[0]['id']), width=150)
+    def render_admin():
+        st.header("📚 Catalog New Acquisition")
+        with st.form("add_book_form"):
+            col1, col2 = st.columns(2)
+            with col1:
+                title = st.text_input("Book Title")
+                author = st.text_input("Author")
+            with col2:
+                genre = st.selectbox("Genre", GENRES)
+                condition = st.select_slider("Condition", CONDITIONS)
+            cover_url = st.text_input("Cover Image URL")
+            if st.form_submit_button("Catalog Book", use_container_width=True):
+                if title and author:
+                    book_data = {"title": title, "author": author, "genre": genre, "condition": condition, "cover_url": cover_url, "status": "Available"}
+                    res = supabase.table("lib_inventory").insert(book_data).execute()
+                    if res.data:
+                        catalog_cache.upsert(res.data)
+                        st.success(f"'{title}' added to inventory!")
+                        st.image(get_qr(res.data[0]['id']), width=150)
+        
+        with st.expander("📥 Bulk Import (CSV / XLSX)"):
+            st.caption(f"Columns: Title, Author, Genre, Condition (optional), Cover URL (optional). Genres: {', '.join(GENRES)}.")
+            upload = st.file_uploader("Acquisition File", type=["csv", "xlsx"])
+            import_qr = st.checkbox("Generate QR label sheet for imported books")
+            if st.button("Start Import", disabled=upload is None, use_container_width=True):
+                existing_keys = {book_key(b['title'], b['author']) for b in catalog_cache.get(load_catalog)}
+                progress = st.progress(0.0, text="Reading file...")
+                with metrics.phase("acquisitions.bulk_import"):
+                    report = import_books(
+                        supabase,
+                        iter_upload(upload, upload.name),
+                        existing_keys,
+                        on_progress=lambda r, done: progress.progress(done, text=f"{r.rows_read:,} rows read · {len(r.inserted):,} added · {r.error_count:,} rejected"),
+                        on_inserted=catalog_cache.upsert,
+                    )
+                st.session_state.import_report = report
+                if import_qr and report.inserted:
+                    with st.spinner("Rendering QR labels..."), metrics.phase("acquisitions.qr_labels"):
+                        pngs = render_qr_batch([book_id for book_id, _ in report.inserted])
+                        st.session_state.import_labels = label_sheets_pdf((pngs[book_id], f"{title} #{book_id}") for book_id, title in report.inserted)
+                else:
+                    st.session_state.import_labels = None
+            
+            report = st.session_state.get('import_report')
+            if report:
+                st.success(f"Imported {len(report.inserted):,} of {report.rows_read:,} rows ({report.duplicates:,} duplicates skipped).")
+                if report.error_count:
+                    st.warning(f"{report.error_count:,} rows were rejected. Showing the first {len(report.error_preview)}.")
+                    st.dataframe(pd.DataFrame(report.error_preview), use_container_width=True, hide_index=True)
+                    st.download_button("⬇️ Download Rejected Rows", report.errors_csv(), file_name="import_errors.csv", mime="text/csv", use_container_width=True)
+                if st.session_state.get('import_labels'):
+                    st.download_button("⬇️ Download QR Labels (PDF)", st.session_state.import_labels, file_name="nova_import_labels.pdf", mime="application/pdf", use_container_width=True)
+        
+        st.divider()
+        st.header("🏷️ Bulk QR Labels")
+        label_catalog = catalog_cache.frame(load_catalog)
+        if label_catalog.empty:
+            st.info("Catalog some books first to print their labels.")
+        else:
+            label_scope = st.radio("Print labels for", ["Selected books", "Whole catalog"], horizontal=True)
+            if label_scope == "Selected books":
+                book_titles = dict(zip(label_catalog['id'].tolist(), label_catalog['title']))
+                label_ids = st.multiselect("Books", list(book_titles), format_func=lambda i: f"{book_titles[i]} (#{i})")
+            else:
+                label_ids = label_catalog['id'].tolist()
+            label_format = st.radio("Format", ["PDF", "PNG sheets (ZIP)"], horizontal=True)
+            
+            if st.button(f"Generate {len(label_ids)} Labels", disabled=not label_ids, use_container_width=True):
+                with st.spinner("Rendering QR labels..."), metrics.phase("acquisitions.qr_labels"):
+                    titles = label_catalog.set_index('id')['title']
+                    pngs = render_qr_batch(label_ids)
+                    sheet_labels = ((pngs[i], f"{titles[i]} #{i}") for i in label_ids)
+                    if label_format == "PDF":
+                        st.session_state.label_sheet = (label_sheets_pdf(sheet_labels), "nova_qr_labels.pdf", "application/pdf")
+                    else:
+                        st.session_state.label_sheet = (label_sheets_zip(sheet_labels), "nova_qr_labels.zip", "application/zip")
+            
+            if st.session_state.get('label_sheet'):
+                sheet_data, sheet_name, sheet_mime = st.session_state.label_sheet
+                st.download_button("⬇️ Download Label Sheets", sheet_data, file_name=sheet_name, mime=sheet_mime, use_container_width=True)
+
+    # --- 📈 TAB 5: ANALYTICS (ADMIN ONLY) ---
+    def render_analytics():
+        h1, h2 = st.columns([4, 1])
+        with h1:
+            st.header("📈 Operations Analytics")
+        with h2:
+            recount = st.button("🔄 Recount", use_container_width=True)
+        
+        # Counters are kept current by the change feed; the ledger is only read in full here
+        try:
+            if ops_metrics.catalog_version != catalog_cache.version:
+                ops_metrics.apply_catalog("reset", catalog_cache.get(load_catalog), catalog_cache.version)
+            if recount or not ops_metrics.built:
+                with st.spinner("Counting the ledger..."), metrics.phase("analytics.rebuild"):
+                    ops_metrics.rebuild(supabase)
+        except Exception as e:
+            st.error(f"Analytics Integration Error: {e}")
+            # A failed recount keeps the last counts; with none yet there is nothing to show
+            if not ops_metrics.built:
+                return
+        
+        summary = ops_metrics.summary()
+        mix = summary["method_mix"]
+        booked = sum(mix.values())
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Shelf Utilization", f"{summary['utilization']:.0%}")
+        m2.metric("Unpaid Exposure", f"₦{summary['unpaid_amount']:,.2f}", f"{summary['unpaid_rentals']} rentals", delta_color="off")
+        turnaround = summary["avg_turnaround_days"]
+        m3.metric("Avg Turnaround", f"{turnaround:.1f} days" if turnaround is not None else "—")
+        m4.metric("Home Delivery Share", f"{mix.get('Home Delivery', 0) / booked:.0%}" if booked else "—")
+        
+        st.subheader("📚 Utilization by Genre")
+        if summary["genres"]:
+            st.dataframe(
+                pd.DataFrame([
+                    {"Genre": genre, "Books": g["books"], "Reserved": g["reserved"], "Rented": g["rented"], "Utilization": f"{g['utilization']:.0%}"}
+                    for genre, g in summary["genres"].items()
+                ]),
+                use_container_width=True, hide_index=True,
+            )
+        else:
+            st.info("Catalog some books first.")
+        
+        daily = pd.DataFrame(ops_metrics.daily()).set_index("day")
+        c1, c2 = st.columns(2)
+        with c1:
+            st.subheader("💰 Revenue per Day (₦)")
+            st.bar_chart(daily["revenue"])
+        with c2:
+            st.subheader("🚚 Pickup vs. Home Delivery")
+            st.bar_chart(daily[["pickup", "delivery"]])
+        st.caption(f"{summary['rentals']:,} rentals counted · last full recount {datetime.fromtimestamp(ops_metrics.built_at):%Y-%m-%d %H:%M}")
+
+    # Only the selected section runs; st.tabs would execute every tab body on each rerun
+    sections = {"🖼️ The Collection": ("collection", render_gallery), "👤 Join Elite": ("join_elite", render_member)}
+    if st.session_state.is_admin:
+        sections["🚚 Delivery Hub"] = ("delivery_hub", render_logistics)
+        sections["⚙️ Admin & Acquisitions"] = ("acquisitions", render_admin)
+        sections["📈 Analytics"] = ("analytics", render_analytics)
+    if st.session_state.get('section') not in sections:
+        st.session_state.section = next(iter(sections))
+    st.radio("Section", list(sections), key="section", horizontal=True, label_visibility="collapsed")
+    phase, render_section = sections[st.session_state.section]
+    st.session_state.sync_view = None
+    with metrics.phase(phase):
+        render_section()
+    if change_feed.available:
+        watch_changes()
+
+metrics.end_rerun()
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""Exercise the cover thumbnail cache against a local HTTP stand-in.
+
+Serves generated covers, a deliberately slow host and a broken link from
+127.0.0.1, then checks that lookups never block, thumbnails come back card
+sized and the on-disk cache stays under its byte budget.
+
+    python -m benchmarks.cover_proxy_check
+"""
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from PIL import Image
+
+from covers import CARD_SIZE, CoverCache
+
+SLOW_HOST_SECONDS = 3.0
+NON_BLOCKING_BUDGET = 0.05
+
+
+def _cover_png(seed):
+    image = Image.new("RGB", (1200, 1800), ((seed * 37) % 256, (seed * 91) % 256, 180))
+    buf = BytesIO()
+    image.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class CoverHost(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/missing"):
+            self.send_error(404)
+            return
+        if self.path.startswith("/slow"):
+            time.sleep(SLOW_HOST_SECONDS)
+        body = _cover_png(sum(self.path.encode()))
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CoverHost)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    failures = []
+
+    def check(label, ok):
+        print(f"  {'ok  ' if ok else 'FAIL'} {label}")
+        if not ok:
+            failures.append(label)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        covers = CoverCache(cache_dir=cache_dir, max_bytes=64 * 1024)
+
+        for path in ("/cover/1.png", "/slow/cover.png", "/missing.png"):
+            started = time.perf_counter()
+            first = covers.thumbnail(base + path)
+            elapsed = time.perf_counter() - started
+            check(f"{path} answered in {elapsed * 1000:.1f} ms without waiting on the host",
+                  elapsed < NON_BLOCKING_BUDGET and first == covers.placeholder)
+
+        covers.wait(timeout=SLOW_HOST_SECONDS + 5)
+        thumb = covers.thumbnail(base + "/cover/1.png")
+        check("fetched cover is served from the cache", thumb != covers.placeholder)
+        check(f"thumbnail is {CARD_SIZE[0]}x{CARD_SIZE[1]}", Image.open(BytesIO(thumb)).size == CARD_SIZE)
+        check("broken link falls back to the placeholder", covers.thumbnail(base + "/missing.png") == covers.placeholder)
+
+        for n in range(200):
+            covers.thumbnail(f"{base}/cover/{n}.png")
+        covers.wait(timeout=30)
+        stats = covers.stats()
+        check(f"cache holds {stats['cache_bytes']:,} bytes within its {covers.max_bytes:,} byte budget",
+              stats["cache_bytes"] <= covers.max_bytes)
+        print(f"  stats: {stats}")
+
+    server.shutdown()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""In-memory stand-in for the Supabase client used by benchmarks and stress runs.
+
+Implements the slice of the postgrest query builder the app calls, including
+embedded joins such as ``lib_inventory(title)`` and ``or_`` filters. Every
+``execute()`` is one simulated round trip, and statements are applied under a
+single lock, so a conditional update is atomic the way it is in Postgres.
+"""
+import itertools
+import random
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from postgrest.exceptions import APIError
+
+
+# Embedded resources: (table, embedded table) -> foreign key column on table
+FOREIGN_KEYS = {
+    ("lib_rentals", "lib_inventory"): "book_id",
+    ("lib_rentals", "lib_members"): "member_id",
+}
+
+
+def _same(a, b):
+    # PostgREST compares the text form of filter values, so "5" matches 5.
+    return a is not None and str(a) == str(b)
+
+
+def _split(text, sep=","):
+    """Split on ``sep`` outside parentheses and double quotes."""
+    parts, depth, quoted, current = [], 0, False, []
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and ch == sep:
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        current.append(ch)
+    if current:
+        parts.append("".join(current).strip())
+    return parts
+
+
+def _compare(op, value, target):
+    if op == "eq":
+        return _same(value, target)
+    if op == "neq":
+        return value is not None and not _same(value, target)
+    if value is None:
+        return False
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        target = type(value)(target)
+    else:
+        value = str(value)
+    return {"lt": value < target, "lte": value <= target, "gt": value > target, "gte": value >= target}[op]
+
+
+def _parse_condition(text):
+    """Compile a PostgREST logic tree like ``a.lt.1,and(a.eq.1,id.lt.5)`` to a row predicate."""
+    text = text.strip()
+    for joiner, combine in (("and(", all), ("or(", any)):
+        if text.startswith(joiner) and text.endswith(")"):
+            terms = [_parse_condition(t) for t in _split(text[len(joiner):-1])]
+            return lambda row: combine(term(row) for term in terms)
+    column, op, target = text.split(".", 2)
+    target = target.strip('"')
+    return lambda row: _compare(op, row.get(column), target)
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self._db = db
+        self._table = table
+        self._op = "select"
+        self._columns = "*"
+        self._payload = None
+        self._filters = []
+        self._order = []
+        self._range = None
+
+    def select(self, columns="*", count=None):
+        self._op = "select"
+        self._columns = columns
+        return self
+
+    def insert(self, rows):
+        self._op = "insert"
+        self._payload = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def update(self, fields):
+        self._op = "update"
+        self._payload = fields
+        return self
+
+    def delete(self):
+        self._op = "delete"
+        return self
+
+    def _where(self, column, test):
+        self._filters.append(lambda row: test(row.get(column)))
+        return self
+
+    def eq(self, column, value):
+        return self._where(column, lambda v: _same(v, value))
+
+    def neq(self, column, value):
+        return self._where(column, lambda v: v is not None and not _same(v, value))
+
+    def in_(self, column, values):
+        wanted = {str(v) for v in values}
+        return self._where(column, lambda v: v is not None and str(v) in wanted)
+
+    def gt(self, column, value):
+        return self._where(column, lambda v: v is not None and v > value)
+
+    def gte(self, column, value):
+        return self._where(column, lambda v: v is not None and v >= value)
+
+    def lt(self, column, value):
+        return self._where(column, lambda v: v is not None and v < value)
+
+    def lte(self, column, value):
+        return self._where(column, lambda v: v is not None and v <= value)
+
+    def or_(self, filters):
+        self._filters.append(_parse_condition(f"or({filters})"))
+        return self
+
+    def order(self, column, desc=False):
+        self._order.append((column, desc))
+        return self
+
+    def range(self, start, end):
+        self._range = (start, end + 1)
+        return self
+
+    def limit(self, size):
+        self._range = (0, size)
+        return self
+
+    def execute(self):
+        return self._db._round_trip(self._apply, (self._table, self._op))
+
+    def _matching(self):
+        rows = self._db.tables[self._table].values()
+        return [row for row in rows if all(test(row) for test in self._filters)]
+
+    def _apply(self):
+        table = self._db.tables[self._table]
+        if self._op == "insert":
+            inserted = []
+            # One statement, one transaction timestamp, as with Postgres now()
+            now = self._db.now()
+            for row in self._payload:
+                row = dict(row)
+                row.setdefault("id", self._db.next_id(self._table))
+                row.setdefault("created_at", now)
+                row.setdefault("updated_at", row["created_at"])
+                table[row["id"]] = row
+                inserted.append(dict(row))
+            return FakeResponse(inserted)
+        if self._op == "update":
+            updated = []
+            for row in self._matching():
+                # Stands in for the trigger in sql/change_feed.sql
+                row.update(self._payload, updated_at=self._db.now())
+                updated.append(dict(row))
+            return FakeResponse(updated)
+        if self._op == "delete":
+            deleted = self._matching()
+            for row in deleted:
+                del table[row["id"]]
+            return FakeResponse([dict(row) for row in deleted])
+
+        rows = self._matching()
+        for column, desc in reversed(self._order):
+            rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        count = len(rows)
+        if self._range:
+            rows = rows[self._range[0]:self._range[1]]
+        return FakeResponse([self._project(row) for row in rows], count=count)
+
+    def _project(self, row):
+        if self._columns.strip() == "*":
+            return dict(row)
+        projected = {}
+        for column in _split(self._columns):
+            if "(" not in column:
+                projected[column] = row.get(column)
+                continue
+            embedded, inner = column[:-1].split("(", 1)
+            key = row.get(FOREIGN_KEYS[(self._table, embedded)])
+            target = self._db.tables[embedded].get(key) if key is not None else None
+            if target is None and key is not None:
+                # Ids from query strings arrive as text; match the way Postgres would cast them
+                target = next((r for k, r in self._db.tables[embedded].items() if str(k) == str(key)), None)
+            projected[embedded] = {c: target.get(c) for c in _split(inner)} if target else None
+        return projected
+
+
+class FakeRpc:
+    def __init__(self, db, name, params):
+        self._db = db
+        self._name = name
+        self._params = params
+
+    def execute(self):
+        def call():
+            function = self._db.functions.get(self._name)
+            if function is None:
+                raise APIError({"code": "PGRST202", "message": f"Could not find the function public.{self._name}"})
+            return FakeResponse(function(self._db, **self._params))
+        return self._db._round_trip(call, (self._name, "rpc"))
+
+
+class FakeSupabase:
+    """Drop-in for ``supabase.Client`` backed by plain dicts.
+
+    ``latency`` seconds, plus up to ``jitter`` more, are slept outside the lock
+    on every round trip to mimic the network. That is what lets concurrent
+    callers interleave. ``calls`` counts round trips per (table, operation).
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, functions=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.functions = functions or {}
+        self.tables = defaultdict(dict)
+        self.round_trips = 0
+        self.calls = Counter()
+        self._random = random.Random(seed)
+        self._counters = defaultdict(lambda: itertools.count(1))
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def now():
+        return datetime.now(timezone.utc).isoformat()
+
+    def next_id(self, table):
+        if table == "lib_rentals":
+            return str(uuid.uuid4())
+        return next(self._counters[table])
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params):
+        return FakeRpc(self, name, params)
+
+    def seed(self, table, rows):
+        for row in rows:
+            row = dict(row)
+            row.setdefault("id", self.next_id(table))
+            row.setdefault("created_at", self.now())
+            row.setdefault("updated_at", row["created_at"])
+            self.tables[table][row["id"]] = row
+
+    def _round_trip(self, statement, label):
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        with self._lock:
+            self.round_trips += 1
+            self.calls[label] += 1
+            return statement()
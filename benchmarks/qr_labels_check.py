@@ -0,0 +1,57 @@
+"""Render a batch of QR labels through the app, large enough to use the encoder pool.
+
+Drives the Bulk QR Labels panel with Streamlit's AppTest against the in-memory
+Supabase stand-in and checks the label sheet comes back and every code landed
+in the on-disk cache:
+
+    python -m benchmarks.qr_labels_check
+"""
+import os
+import sys
+import tempfile
+
+import streamlit as st
+
+import db
+from benchmarks.run_benchmarks import first, new_app, seed_backend
+from labels import CACHE_DIR, POOL_THRESHOLD
+from realtime_sync import stop_feeds
+
+BOOKS = POOL_THRESHOLD * 3
+
+
+def main():
+    failures = []
+
+    def check(label, ok):
+        print(f"  {'ok  ' if ok else 'FAIL'} {label}")
+        if not ok:
+            failures.append(label)
+
+    db.install(seed_backend(BOOKS, 0.0, 0.0, seed=7))
+    stop_feeds()
+    st.cache_resource.clear()
+    here = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # The app writes to the relative CACHE_DIR; start from an empty one
+        os.chdir(workdir)
+        try:
+            at = new_app(is_admin=True, section="⚙️ Admin & Acquisitions")
+            at.run()
+            first(at.radio, "Print labels for").set_value("Whole catalog").run()
+            first(at.button, f"Generate {BOOKS} Labels").click().run()
+            check("label run raised no exception", not at.exception)
+            for e in at.exception:
+                print(f"    {e.message}")
+            sheet = at.session_state["label_sheet"] if "label_sheet" in at.session_state else None
+            check("PDF label sheet is ready to download", sheet is not None and sheet[0].startswith(b"%PDF"))
+            cached = sum(len(files) for _, _, files in os.walk(CACHE_DIR))
+            check(f"{cached} of {BOOKS} codes cached on disk", cached == BOOKS)
+        finally:
+            os.chdir(here)
+    stop_feeds()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Load and latency benchmarks for app.py against the in-memory Supabase stand-in.
+
+Drives the real script through Streamlit's AppTest for each scenario and data
+size, and reports rerun latency (p50/p95), Supabase round trips per action and
+peak Python memory:
+
+    python -m benchmarks.run_benchmarks --sizes 100,1000,5000 --latency-ms 20
+
+No network access or Supabase project is needed.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import db
+from benchmarks.fake_supabase import FakeSupabase
+from catalog import GENRES
+from ledger import ALL_STATUSES
+from realtime_sync import stop_feeds
+
+APP_PATH = str(Path(__file__).resolve().parents[1] / "app.py")
+# No change-feed thread: its polls would land in the per-action round trips
+SECRETS = {"supabase": {"url": "http://fake-supabase.local", "key": "benchmark"}, "sync": {"enabled": False}}
+WORDS = "river night garden empire silent golden broken city winter stone letters house".split()
+
+
+def seed_backend(size, latency, jitter, seed):
+    """A stand-in with ``size`` books, ``size // 10`` members and ``size * 2`` rentals."""
+    rng = random.Random(seed)
+    fake = FakeSupabase(latency=latency, jitter=jitter, seed=seed)
+    fake.seed("lib_inventory", [
+        {
+            "title": " ".join(rng.sample(WORDS, 3)).title(),
+            "author": f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}",
+            "genre": rng.choice(GENRES),
+            "condition": "Good",
+            "cover_url": "",
+            "status": rng.choices(["Available", "Reserved", "Rented"], [8, 1, 1])[0],
+        }
+        for _ in range(size)
+    ])
+    fake.seed("lib_members", [
+        {"full_name": f"Member {n}", "email": f"member{n}@example.com", "phone": f"0800{n:07d}"}
+        for n in range(max(size // 10, 1))
+    ])
+    book_ids = list(fake.tables["lib_inventory"])
+    member_ids = list(fake.tables["lib_members"])
+    start = datetime.now(timezone.utc) - timedelta(days=365)
+    fake.seed("lib_rentals", [
+        {
+            "book_id": rng.choice(book_ids),
+            "member_id": rng.choice(member_ids) if rng.random() < 0.5 else None,
+            "created_at": (start + timedelta(minutes=n * 5)).isoformat(),
+            "due_date": (start + timedelta(days=7, minutes=n * 5)).strftime("%Y-%m-%d"),
+            "delivery_type": "Home Delivery" if rng.random() < 0.5 else "Pickup by Guest",
+            "delivery_status": rng.choice(ALL_STATUSES),
+            "is_paid": rng.random() < 0.5,
+        }
+        for n in range(size * 2)
+    ])
+    return fake
+
+
+def new_app(**session):
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    for section, values in SECRETS.items():
+        at.secrets[section] = values
+    for key, value in session.items():
+        at.session_state[key] = value
+    return at
+
+
+def first(widgets, label_prefix):
+    return next(w for w in widgets if w.label.startswith(label_prefix))
+
+
+def available_books(fake, n):
+    return [i for i, b in fake.tables["lib_inventory"].items() if b["status"] == "Available"][:n]
+
+
+# Each scenario sets up an app, then yields (action_name, callable) pairs to time.
+def gallery_browse(fake, rng):
+    at = new_app()
+    yield "open collection", at.run
+    search = at.main.text_input[0]
+    yield "search", lambda: search.input(rng.choice(WORDS)[:4]).run()
+    yield "clear search", lambda: search.input("").run()
+    yield "add to selection", lambda: first(at.main.button, "Add to Selection").click().run()
+
+
+def qr_express_checkout(fake, rng):
+    at = new_app()
+    at.query_params["id"] = str(available_books(fake, 1)[0])
+    yield "scan QR", at.run
+    yield "type name", lambda: first(at.text_input, "Enter your Name").input("Benchmark Guest").run()
+    yield "reserve", lambda: first(at.button, "Reserve & Generate Payment Link").click().run()
+
+
+def cart_checkout(fake, rng):
+    at = new_app(cart=available_books(fake, 10))
+    at.query_params["checkout"] = "true"
+    yield "open checkout", at.run
+    yield "type name", lambda: first(at.text_input, "Enter your Name").input("Benchmark Guest").run()
+    yield "reserve 10 books", lambda: first(at.button, "Reserve & Generate Payment Link").click().run()
+
+
+def dispatch_desk(fake, rng):
+    at = new_app(is_admin=True, section="🚚 Delivery Hub")
+    yield "open delivery hub", at.run
+    yield "next page", lambda: first(at.button, "Older").click().run()
+    yield "commit update", lambda: first(at.button, "Commit Update").click().run()
+
+
+SCENARIOS = {
+    "gallery": gallery_browse,
+    "qr_checkout": qr_express_checkout,
+    "cart_checkout": cart_checkout,
+    "dispatch": dispatch_desk,
+}
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run_scenario(name, size, repeats, latency, jitter, seed):
+    samples = {}
+    for n in range(repeats):
+        # A fresh backend and cold process caches per repeat, like a new deploy
+        fake = seed_backend(size, latency, jitter, seed + n)
+        db.install(fake)
+        stop_feeds()
+        st.cache_resource.clear()
+        rng = random.Random(seed + n)
+        for action, step in SCENARIOS[name](fake, rng):
+            trips_before = fake.round_trips
+            tracemalloc.reset_peak()
+            started = time.perf_counter()
+            at = step()
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            if at is not None and at.exception:
+                raise RuntimeError(f"{name}/{action} raised: {at.exception[0].message}")
+            record = samples.setdefault(action, {"ms": [], "round_trips": [], "peak_mb": []})
+            record["ms"].append(elapsed * 1000)
+            record["round_trips"].append(fake.round_trips - trips_before)
+            record["peak_mb"].append(peak / 1024 / 1024)
+    return [
+        {
+            "scenario": name,
+            "size": size,
+            "action": action,
+            "p50_ms": round(statistics.median(r["ms"]), 1),
+            "p95_ms": round(percentile(r["ms"], 0.95), 1),
+            "round_trips": round(statistics.mean(r["round_trips"]), 1),
+            "peak_mb": round(max(r["peak_mb"]), 1),
+        }
+        for action, r in samples.items()
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,5000", help="comma-separated catalog sizes")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="injected latency per round trip")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="extra random latency per round trip")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    results = []
+    print(f"{'scenario':<14} {'size':>6}  {'action':<20} {'p50 ms':>8} {'p95 ms':>8} {'trips':>6} {'peak MB':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        for name in args.scenarios.split(","):
+            for row in run_scenario(name, size, args.repeats, args.latency_ms / 1000, args.jitter_ms / 1000, args.seed):
+                results.append(row)
+                print(f"{row['scenario']:<14} {row['size']:>6}  {row['action']:<20} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['round_trips']:>6} {row['peak_mb']:>8}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
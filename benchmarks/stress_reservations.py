@@ -0,0 +1,74 @@
+"""Concurrent checkout stress run against the in-memory Supabase stand-in.
+
+Many shoppers race for a small set of popular books. The run fails if any copy
+ends up with two rentals, or if a book's status disagrees with its rentals.
+
+    python -m benchmarks.stress_reservations --shoppers 400 --threads 32
+"""
+import argparse
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_supabase import FakeSupabase
+from checkout import build_rentals, reserve_books
+
+
+def run(shoppers, threads, books, hot, cart_size, latency, seed):
+    rng = random.Random(seed)
+    db = FakeSupabase(latency=latency)
+    db.seed("lib_inventory", [
+        {"title": f"Book {i}", "author": "Stress", "genre": "Fiction", "status": "Available"}
+        for i in range(books)
+    ])
+    hot_ids = list(db.tables["lib_inventory"])[:hot]
+    carts = [
+        (rng.sample(hot_ids, rng.randint(1, cart_size)), rng.random() < 0.5)
+        for _ in range(shoppers)
+    ]
+
+    def checkout(n):
+        book_ids, all_or_nothing = carts[n]
+        rentals = build_rentals([{"id": i} for i in book_ids], f"Pickup by shopper {n}", "Awaiting Pickup")
+        return reserve_books(db, rentals, all_or_nothing=all_or_nothing)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(checkout, range(shoppers)))
+    elapsed = time.perf_counter() - started
+
+    rentals_per_book = Counter(r["book_id"] for r in db.tables["lib_rentals"].values())
+    errors = [f"book {book_id} rented {n} times" for book_id, n in rentals_per_book.items() if n > 1]
+    for book_id, book in db.tables["lib_inventory"].items():
+        reserved = book["status"] == "Reserved"
+        if reserved != (book_id in rentals_per_book):
+            errors.append(f"book {book_id} is {book['status']} with {rentals_per_book[book_id]} rentals")
+
+    print(f"{shoppers} checkouts on {threads} threads in {elapsed:.2f}s ({db.round_trips} round trips)")
+    print(f"  full carts:    {sum(1 for r in results if r.rentals and not r.conflicts)}")
+    print(f"  partial carts: {sum(1 for r in results if r.rentals and r.conflicts)}")
+    print(f"  rejected:      {sum(1 for r in results if not r.rentals)}")
+    print(f"  books reserved: {len(rentals_per_book)} of {hot} contended")
+    for error in errors:
+        print(f"  VIOLATION: {error}")
+    return not errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shoppers", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--books", type=int, default=200)
+    parser.add_argument("--hot", type=int, default=40, help="number of contended books shoppers pick from")
+    parser.add_argument("--cart-size", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.002, help="simulated seconds per round trip")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    ok = run(args.shoppers, args.threads, args.books, args.hot, args.cart_size, args.latency, args.seed)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
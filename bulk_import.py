@@ -0,0 +1,173 @@
+"""Streaming bulk catalog import from CSV or XLSX uploads."""
+import csv
+import io
+import tempfile
+
+from catalog import GENRES, CONDITIONS
+from search_index import normalize
+
+IMPORT_CHUNK_SIZE = 500
+ERROR_PREVIEW_ROWS = 50
+
+COLUMN_ALIASES = {
+    "title": "title", "book title": "title", "book": "title",
+    "author": "author", "authors": "author", "writer": "author",
+    "genre": "genre", "category": "genre",
+    "condition": "condition",
+    "cover_url": "cover_url", "cover url": "cover_url", "cover image url": "cover_url", "cover": "cover_url",
+}
+
+# Same vocabularies as the Catalog Book form, matched case- and punctuation-insensitively
+_GENRES = {normalize(g): g for g in GENRES}
+_GENRES.update({"nonfiction": "Non-Fiction", "science fiction": "Sci-Fi", "scifi": "Sci-Fi", "children": "Children's Fantasy", "fantasy": "Children's Fantasy"})
+_CONDITIONS = {normalize(c): c for c in CONDITIONS}
+DEFAULT_CONDITION = "Good"
+
+
+def book_key(title, author):
+    """Dedupe key: two rows are the same book if title and author normalize equal."""
+    return normalize(title), normalize(author)
+
+
+def _header(names, aliases):
+    return [aliases.get(str(name or "").strip().lower().replace("_", " "), str(name or "").strip().lower()) for name in names]
+
+
+def iter_upload(file, filename, aliases=COLUMN_ALIASES):
+    """Yield ``(row_number, raw_row, fraction_read)`` without loading the whole file.
+
+    ``row_number`` matches what the uploader sees in a spreadsheet (header is row 1).
+    Header names are mapped through ``aliases``.
+    """
+    if filename.lower().endswith(".xlsx"):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            sheet = workbook.active
+            rows = sheet.iter_rows(values_only=True)
+            columns = _header(next(rows, ()), aliases)
+            total = max(sheet.max_row or 1, 1)
+            for n, values in enumerate(rows, 2):
+                if any(v not in (None, "") for v in values):
+                    # Read-only sheets may report no (or a one-cell) dimension
+                    yield n, dict(zip(columns, values)), min(n / total, 1.0)
+        finally:
+            workbook.close()
+        return
+
+    size = max(getattr(file, "size", 0), 1)
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.reader(text)
+        columns = _header(next(reader, []), aliases)
+        for n, values in enumerate(reader, 2):
+            if any(v.strip() for v in values):
+                yield n, dict(zip(columns, values)), min(file.tell() / size, 1.0)
+    finally:
+        # Hand the upload back to Streamlit instead of closing it with the wrapper
+        text.detach()
+
+
+def _clean(value):
+    return " ".join(str(value).split()) if value is not None else ""
+
+
+def normalize_row(raw):
+    """Validate one uploaded row; returns ``(book, None)`` or ``(None, error_message)``."""
+    title = _clean(raw.get("title"))
+    author = _clean(raw.get("author"))
+    if not title or not author:
+        return None, "Title and Author are required"
+
+    genre_text = _clean(raw.get("genre"))
+    genre = _GENRES.get(normalize(genre_text))
+    if genre is None:
+        return None, f"Unknown genre '{genre_text}' (expected one of: {', '.join(GENRES)})"
+
+    condition_text = _clean(raw.get("condition"))
+    condition = _CONDITIONS.get(normalize(condition_text)) if condition_text else DEFAULT_CONDITION
+    if condition is None:
+        return None, f"Unknown condition '{condition_text}' (expected one of: {', '.join(CONDITIONS)})"
+
+    cover_url = _clean(raw.get("cover_url"))
+    if cover_url and not cover_url.lower().startswith(("http://", "https://")):
+        return None, f"Cover URL must start with http:// or https:// ('{cover_url}')"
+
+    return {"title": title, "author": author, "genre": genre, "condition": condition, "cover_url": cover_url, "status": "Available"}, None
+
+
+class ImportReport:
+    """Running totals of an import; rejected rows spill to a temp file past 1 MB."""
+
+    def __init__(self):
+        self.rows_read = 0
+        self.duplicates = 0
+        self.inserted = []
+        self.error_count = 0
+        self.error_preview = []
+        self._errors = tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode="w+", newline="")
+        self._error_writer = csv.writer(self._errors)
+        self._error_writer.writerow(["row", "error", "title", "author"])
+
+    def reject(self, row_number, message, raw):
+        self.error_count += 1
+        record = (row_number, message, _clean(raw.get("title")), _clean(raw.get("author")))
+        self._error_writer.writerow(record)
+        if len(self.error_preview) < ERROR_PREVIEW_ROWS:
+            self.error_preview.append(dict(zip(["Row", "Error", "Title", "Author"], record)))
+
+    def errors_csv(self):
+        self._errors.seek(0)
+        return self._errors.read()
+
+
+def import_books(client, rows, existing_keys, chunk_size=IMPORT_CHUNK_SIZE, on_progress=None, on_inserted=None):
+    """Insert validated ``rows`` from ``iter_upload()`` into ``lib_inventory`` in chunks.
+
+    Rows already in ``existing_keys`` (see ``book_key``), or repeated earlier in
+    the file, are rejected as duplicates. Only one chunk is held at a time.
+    ``on_progress(report, fraction)`` runs after every chunk and
+    ``on_inserted(rows)`` receives each chunk's inserted rows.
+    """
+    report = ImportReport()
+    seen = set(existing_keys)
+    batch = []
+    fraction = 0.0
+
+    def flush():
+        if not batch:
+            return
+        try:
+            inserted = client.table("lib_inventory").insert([book for _, book, _ in batch]).execute().data or []
+        except Exception as e:
+            for row_number, _, raw in batch:
+                report.reject(row_number, f"Insert failed: {e}", raw)
+        else:
+            report.inserted.extend((row['id'], row['title']) for row in inserted)
+            if on_inserted:
+                on_inserted(inserted)
+        batch.clear()
+        if on_progress:
+            on_progress(report, fraction)
+
+    for row_number, raw, fraction in rows:
+        report.rows_read += 1
+        book, error = normalize_row(raw)
+        if error:
+            report.reject(row_number, error, raw)
+            continue
+        key = book_key(book['title'], book['author'])
+        if key in seen:
+            report.duplicates += 1
+            report.reject(row_number, "Duplicate of a book already in the catalog or earlier in this file", raw)
+            continue
+        seen.add(key)
+        batch.append((row_number, book, raw))
+        if len(batch) >= chunk_size:
+            flush()
+    fraction = 1.0
+    flush()
+    if on_progress:
+        on_progress(report, fraction)
+    return report
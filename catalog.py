@@ -0,0 +1,141 @@
+"""Process-wide catalog cache shared by every Streamlit session."""
+import threading
+import time
+
+import pandas as pd
+
+from db import fetch_all
+
+# Only the columns the gallery displays; "*" drags every column over the wire.
+CATALOG_COLUMNS = "id, title, author, genre, cover_url, status"
+CATALOG_PAGE_SIZE = 1000
+# Longest the change feed may postpone a full reload; catches deletes and missed changes
+CATALOG_MAX_AGE = 900
+
+GENRES = ["Fiction", "Non-Fiction", "Sci-Fi", "History", "Children's Fantasy", "Education"]
+CONDITIONS = ["Fair", "Good", "Very Good", "New"]
+
+
+def fetch_catalog(client, columns=CATALOG_COLUMNS, page_size=CATALOG_PAGE_SIZE):
+    """Read ``lib_inventory`` in id-keyset pages.
+
+    PostgREST caps a single response, so large catalogs must be paged anyway.
+    """
+    return fetch_all(lambda: client.table("lib_inventory").select(columns), page_size)
+
+
+class CatalogCache:
+    """One copy of ``lib_inventory`` for the whole server process.
+
+    Rows are reloaded when the TTL lapses or after ``invalidate()``. The change
+    feed can restart the TTL with ``mark_fresh()``, but never past ``max_age``
+    after the last full load. Write paths
+    patch rows in place so other sessions see new statuses without waiting for
+    the next reload. Every change bumps ``version``.
+    """
+
+    def __init__(self, ttl=60, max_age=CATALOG_MAX_AGE):
+        self.ttl = ttl
+        self.max_age = max_age
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._rows = None
+        self._loaded_at = 0.0
+        self._fresh_at = 0.0
+        self._frame = None
+        self._frame_version = -1
+        self._listeners = []
+        self._lock = threading.RLock()
+
+    def subscribe(self, listener):
+        """Call ``listener(event, rows, version)`` on every change.
+
+        ``event`` is ``"reset"`` with all rows after a reload, or ``"upsert"``
+        with just the changed rows after a patch or insert.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _notify(self, event, rows):
+        for listener in self._listeners:
+            listener(event, rows, self.version)
+
+    def is_fresh(self):
+        now = time.monotonic()
+        return self._rows is not None and now - self._fresh_at < self.ttl and now - self._loaded_at < self.max_age
+
+    def mark_fresh(self):
+        """Restart the TTL; called by the change feed after it has caught up."""
+        with self._lock:
+            if self._rows is not None:
+                self._fresh_at = time.monotonic()
+
+    def get(self, loader):
+        """Return cached rows, calling ``loader()`` once if they are missing or expired."""
+        with self._lock:
+            if self.is_fresh():
+                self.hits += 1
+            else:
+                # Loading under the lock means concurrent sessions wait for one
+                # query instead of all hitting the database at once.
+                self.misses += 1
+                self._rows = {row["id"]: row for row in loader()}
+                self._loaded_at = self._fresh_at = time.monotonic()
+                self.version += 1
+                self._notify("reset", list(self._rows.values()))
+            return list(self._rows.values())
+
+    def frame(self, loader):
+        """Return the catalog as a DataFrame, rebuilt only when the version changes.
+
+        The frame is shared between sessions, so callers must not mutate it.
+        """
+        with self._lock:
+            # One lock hold, so a patch cannot land between reading rows and stamping the version
+            rows = self.get(loader)
+            if self._frame_version != self.version:
+                self._frame = pd.DataFrame(rows)
+                self._frame_version = self.version
+            return self._frame
+
+    def invalidate(self):
+        with self._lock:
+            self._rows = None
+            self.version += 1
+
+    def patch(self, book_ids, fields):
+        """Apply ``fields`` to the cached rows for ``book_ids``."""
+        with self._lock:
+            if self._rows is None:
+                return
+            changed = []
+            for book_id in book_ids:
+                row = self._rows.get(book_id)
+                if row is not None:
+                    self._rows[book_id] = {**row, **fields}
+                    changed.append(self._rows[book_id])
+            self.version += 1
+            self._notify("upsert", changed)
+
+    def upsert(self, rows):
+        """Insert or replace whole rows, e.g. freshly catalogued books."""
+        with self._lock:
+            if self._rows is None:
+                return
+            for row in rows:
+                self._rows[row["id"]] = row
+            self.version += 1
+            self._notify("upsert", rows)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "version": self.version,
+                "rows": len(self._rows) if self._rows is not None else 0,
+                "age_seconds": time.monotonic() - self._loaded_at if self._rows is not None else None,
+            }
@@ -0,0 +1,91 @@
+"""Checkout pipeline: reserve a whole cart in a constant number of round trips."""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from postgrest.exceptions import APIError
+
+from reservations import claim_books, release_books
+
+RENTAL_DAYS = 7
+
+# PostgREST error code for "function not found"; see sql/reserve_books.sql.
+_MISSING_FUNCTION = "PGRST202"
+_rpc_available = True
+
+
+@dataclass
+class ReservationResult:
+    """Outcome of a checkout: the rentals written and the books another shopper got first."""
+    rentals: list = field(default_factory=list)
+    conflicts: list = field(default_factory=list)
+
+    @property
+    def reserved_ids(self):
+        return [r['book_id'] for r in self.rentals]
+
+
+def fetch_checkout_books(client, book_ids):
+    return client.table("lib_inventory").select("*").in_("id", list(book_ids)).execute().data or []
+
+
+def find_member(client, email):
+    res = client.table("lib_members").select("*").eq("email", email).execute()
+    return res.data[0] if res.data else None
+
+
+def build_rentals(books, delivery_type, delivery_status, member_id=None):
+    """Pending ``lib_rentals`` rows for every book in the cart."""
+    due_date = (datetime.now() + timedelta(days=RENTAL_DAYS)).strftime('%Y-%m-%d')
+    rentals = []
+    for b in books:
+        rental = {
+            "book_id": b['id'],
+            "due_date": due_date,
+            "delivery_type": delivery_type,
+            "delivery_status": delivery_status,
+            "is_paid": False,
+        }
+        if member_id is not None:
+            rental["member_id"] = member_id
+        rentals.append(rental)
+    return rentals
+
+
+def reserve_books(client, rentals, all_or_nothing=True):
+    """Claim the cart's books and insert rentals for the ones won.
+
+    Books are claimed with a conditional Available -> Reserved update, so
+    concurrent checkouts never both get the same copy. With ``all_or_nothing``
+    any conflict releases the whole cart; otherwise the books that were still
+    free are reserved and the rest are reported in ``conflicts``.
+
+    Uses the ``reserve_books`` database function when it is installed, which
+    does everything in one atomic call. Otherwise falls back to a claim, one
+    bulk insert and, on failure or conflict, one release.
+    """
+    global _rpc_available
+    if _rpc_available:
+        try:
+            res = client.rpc("reserve_books", {"rentals": rentals, "all_or_nothing": all_or_nothing}).execute()
+            return ReservationResult(rentals=res.data['rentals'], conflicts=res.data['conflicts'])
+        except APIError as e:
+            if e.code != _MISSING_FUNCTION:
+                raise
+            _rpc_available = False
+
+    requested = [r['book_id'] for r in rentals]
+    claimed = claim_books(client, requested)
+    won = {str(book_id) for book_id in claimed}
+    conflicts = [book_id for book_id in requested if str(book_id) not in won]
+    if not claimed or (conflicts and all_or_nothing):
+        release_books(client, claimed)
+        return ReservationResult(conflicts=conflicts)
+
+    try:
+        inserted = client.table("lib_rentals").insert(
+            [r for r in rentals if str(r['book_id']) in won]
+        ).execute().data
+    except Exception:
+        release_books(client, claimed)
+        raise
+    return ReservationResult(rentals=inserted, conflicts=conflicts)
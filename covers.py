@@ -0,0 +1,155 @@
+"""Book cover thumbnails: fetched off the render path, resized once, LRU-cached on disk."""
+import hashlib
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageOps, features
+
+CARD_SIZE = (200, 300)
+CACHE_DIR = os.path.join(".cache", "covers")
+MAX_CACHE_BYTES = 50 * 1024 * 1024
+FETCH_TIMEOUT = 5
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+# A host that failed is not retried for this long, so a dead link costs one attempt
+RETRY_AFTER = 300
+
+THUMB_FORMAT, THUMB_EXT = ("WEBP", ".webp") if features.check("webp") else ("JPEG", ".jpg")
+
+
+def fetch_url(url, timeout=FETCH_TIMEOUT):
+    request = urllib.request.Request(url, headers={"User-Agent": "NovaLibrary-CoverProxy/1.0"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        data = response.read(MAX_SOURCE_BYTES + 1)
+    if len(data) > MAX_SOURCE_BYTES:
+        raise ValueError(f"cover larger than {MAX_SOURCE_BYTES} bytes")
+    return data
+
+
+def _encode(image):
+    buf = BytesIO()
+    image.save(buf, format=THUMB_FORMAT, quality=75)
+    return buf.getvalue()
+
+
+def render_placeholder(size=CARD_SIZE):
+    """Local 'No Cover' card, so a missing cover never depends on a third-party host."""
+    image = Image.new("RGB", size, (237, 233, 254))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([6, 6, size[0] - 7, size[1] - 7], outline=(91, 33, 182), width=3)
+    draw.text((size[0] // 2, size[1] // 2), "No Cover", fill=(91, 33, 182), anchor="mm")
+    return _encode(image)
+
+
+class CoverCache:
+    """Serves card-sized cover thumbnails from a size-bounded on-disk LRU cache.
+
+    ``thumbnail(url)`` never touches the network: a cache miss queues a
+    background fetch and returns the placeholder, and the real cover appears
+    on a later rerun. Reads refresh a file's mtime, which is the LRU order.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, size=CARD_SIZE, workers=4, fetch=fetch_url):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.size = size
+        self.placeholder = render_placeholder(size)
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self._fetch = fetch
+        self._pending = set()
+        self._failed = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cover-fetch")
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(entry.stat().st_size for entry in os.scandir(cache_dir) if entry.is_file())
+
+    def path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest() + THUMB_EXT)
+
+    def thumbnail(self, url):
+        """Thumbnail bytes for ``url``, or the placeholder while it is being fetched."""
+        if not isinstance(url, str) or not url.strip():
+            return self.placeholder
+        url = url.strip()
+        path = self.path(url)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            self.hits += 1
+            return data
+        except FileNotFoundError:
+            pass
+
+        with self._lock:
+            self.misses += 1
+            failed_at = self._failed.get(url)
+            if url not in self._pending and (failed_at is None or time.monotonic() - failed_at > RETRY_AFTER):
+                self._pending.add(url)
+                self._pool.submit(self._fill, url, path)
+        return self.placeholder
+
+    def _fill(self, url, path):
+        try:
+            source = Image.open(BytesIO(self._fetch(url)))
+            data = _encode(ImageOps.fit(source.convert("RGB"), self.size, Image.LANCZOS))
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            with self._lock:
+                self._failed.pop(url, None)
+                self._total_bytes += len(data)
+                if self._total_bytes > self.max_bytes:
+                    self._evict()
+        except Exception:
+            with self._lock:
+                self.failures += 1
+                self._failed[url] = time.monotonic()
+        finally:
+            with self._lock:
+                self._pending.discard(url)
+
+    def _evict(self):
+        """Delete least recently used thumbnails until the cache is 90% full."""
+        entries = sorted(
+            (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+            for entry in os.scandir(self.cache_dir)
+            if entry.is_file() and entry.name.endswith(THUMB_EXT)
+        )
+        self._total_bytes = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._total_bytes -= size
+
+    def wait(self, timeout=None):
+        """Block until queued fetches finish; for scripts and checks, not the app."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return True
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "failures": self.failures,
+                "pending": len(self._pending),
+                "cache_bytes": self._total_bytes,
+            }
@@ -0,0 +1,196 @@
+"""Process-wide Supabase access: one long-lived client with timeouts and retries.
+
+Streamlit re-runs ``app.py`` on every interaction, so creating the client there
+would pay connection and TLS setup on every click. ``get_database()`` hands
+every session, thread and background job the same client. Its HTTP session
+keeps connections alive between requests.
+"""
+import random
+import threading
+import time
+
+import httpx
+from postgrest.exceptions import APIError
+from supabase import ClientOptions, create_client
+
+REQUEST_TIMEOUT = 10
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.2
+BACKOFF_MAX = 2.0
+
+# Failures where the request never reached the server; safe to retry any write
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# Failures after the request may have run; only reads are retried
+_MAYBE_SENT = (httpx.ReadTimeout, httpx.ReadError, httpx.WriteError, httpx.RemoteProtocolError)
+# Gateway errors, rate limiting, serialization failures and deadlocks
+_RETRYABLE_CODES = {"408", "429", "500", "502", "503", "504", "40001", "40P01"}
+_IDEMPOTENT_METHODS = {"GET", "HEAD"}
+_OPERATIONS = {"select", "insert", "upsert", "update", "delete"}
+
+_database = None
+_database_lock = threading.Lock()
+
+
+class Query:
+    """Wraps a postgrest request builder so ``execute()`` goes through ``Database``.
+
+    Remembers the table and operation (select, insert, ...) for instrumentation.
+    """
+
+    __slots__ = ("_db", "_builder", "_table", "_operation")
+
+    def __init__(self, db, builder, table, operation):
+        self._db = db
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if hasattr(attr, "execute"):
+            return Query(self._db, attr, self._table, self._operation)
+        if not callable(attr):
+            return attr
+        operation = name if name in _OPERATIONS else self._operation
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return Query(self._db, result, self._table, operation) if hasattr(result, "execute") else result
+        return call
+
+    def execute(self):
+        return self._db.execute(self._builder, self._table, self._operation)
+
+
+class Database:
+    """Thread-safe front for a Supabase client, used like the client itself.
+
+    ``table()`` and ``rpc()`` return builders whose ``execute()`` retries
+    transient failures with jittered exponential backoff and counts every call.
+    If ``recorder`` is set (see ``perf.Metrics``) each call, retries included,
+    is reported to ``recorder.record_query()``.
+    """
+
+    def __init__(self, client, retries=MAX_RETRIES, recorder=None):
+        self.client = client
+        self.retries = retries
+        self.recorder = recorder
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._retries = 0
+        self._failures = 0
+        self._in_flight = 0
+        self._busy_seconds = 0.0
+
+    def table(self, name):
+        return Query(self, self.client.table(name), name, "select")
+
+    def rpc(self, name, params=None):
+        return Query(self, self.client.rpc(name, params or {}), name, "rpc")
+
+    def _retryable(self, error, method):
+        if isinstance(error, _NOT_SENT):
+            return True
+        if isinstance(error, _MAYBE_SENT):
+            return method in _IDEMPOTENT_METHODS
+        if isinstance(error, APIError):
+            return str(error.code) in _RETRYABLE_CODES and method in _IDEMPOTENT_METHODS
+        return False
+
+    def execute(self, builder, table="?", operation="?"):
+        if self.recorder is None:
+            return self._execute(builder)
+        started = time.perf_counter()
+        try:
+            res = self._execute(builder)
+        except Exception as e:
+            self.recorder.record_query(table, operation, 0, time.perf_counter() - started, error=e)
+            raise
+        rows = len(res.data) if isinstance(res.data, list) else int(res.data is not None)
+        self.recorder.record_query(table, operation, rows, time.perf_counter() - started)
+        return res
+
+    def _execute(self, builder):
+        method = str(getattr(builder, "http_method", "POST")).upper()
+        attempt = 0
+        while True:
+            with self._lock:
+                self._requests += 1
+                self._in_flight += 1
+            started = time.perf_counter()
+            try:
+                return builder.execute()
+            except Exception as e:
+                if attempt >= self.retries or not self._retryable(e, method):
+                    with self._lock:
+                        self._failures += 1
+                    raise
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                    self._busy_seconds += time.perf_counter() - started
+            attempt += 1
+            with self._lock:
+                self._retries += 1
+            time.sleep(min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0))
+
+    def _open_connections(self):
+        # httpx does not expose pool state publicly; report it when we can see it
+        try:
+            return len(self.client.postgrest.session._transport._pool.connections)
+        except Exception:
+            return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "retries": self._retries,
+                "failures": self._failures,
+                "in_flight": self._in_flight,
+                "avg_ms": 1000 * self._busy_seconds / self._requests if self._requests else 0.0,
+                "open_connections": self._open_connections(),
+            }
+
+
+def get_database(url, key, timeout=REQUEST_TIMEOUT, retries=MAX_RETRIES):
+    """Return the process-wide ``Database``, creating its client on first use."""
+    global _database
+    with _database_lock:
+        if _database is None:
+            client = create_client(url, key, options=ClientOptions(postgrest_client_timeout=timeout))
+            _database = Database(client, retries=retries)
+        return _database
+
+
+def install(client, retries=MAX_RETRIES):
+    """Use ``client`` (e.g. the benchmarks' in-memory stand-in) for the rest of the process."""
+    global _database
+    with _database_lock:
+        _database = Database(client, retries=retries)
+        return _database
+
+
+def fetch_all(query, page_size, keyset=True):
+    """Read every row ``query()`` matches, ``page_size`` rows per request.
+
+    ``query()`` returns a fresh, filtered builder for each page. With ``keyset``
+    pages are ordered by ``id`` and each seeks past the last id already read, so
+    the last page of a long table costs the same as the first. Otherwise
+    ``query()`` sets its own order and pages are read with ``range()``.
+    """
+    rows = []
+    last_id = None
+    while True:
+        builder = query()
+        if keyset:
+            if last_id is not None:
+                builder = builder.gt("id", last_id)
+            builder = builder.order("id").limit(page_size)
+        else:
+            builder = builder.range(len(rows), len(rows) + page_size - 1)
+        page = builder.execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        last_id = page[-1]["id"]
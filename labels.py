@@ -0,0 +1,179 @@
+"""QR labels: disk-cached per-book QR codes and printable A4 label sheets."""
+import argparse
+import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import qrcode
+from PIL import Image, ImageDraw, ImageFont
+
+APP_URL = "https://aicon-library.streamlit.app"
+CACHE_DIR = os.path.join(".cache", "qr")
+
+# A4 at 300 dpi, 4 x 6 labels per sheet
+PAGE_SIZE = (2480, 3508)
+PAGE_MARGIN = 120
+GRID = (4, 6)
+CAPTION_HEIGHT = 90
+CAPTION_CHARS = 28
+
+# Below this many uncached codes, starting the encoder processes costs more than it saves
+POOL_THRESHOLD = 16
+
+
+def book_url(book_id, base_url=APP_URL):
+    return f"{base_url}/?id={book_id}"
+
+
+def _cache_path(book_id, url, cache_dir):
+    key = hashlib.sha256(f"{book_id}\n{url}".encode()).hexdigest()
+    return os.path.join(cache_dir, key[:2], f"{key}.png")
+
+
+def _read(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def qr_png(book_id, base_url=APP_URL, cache_dir=CACHE_DIR):
+    """PNG bytes of the QR code that opens the express checkout for ``book_id``.
+
+    Codes are cached on disk under a hash of the book id and URL, so a label is
+    encoded once and a changed base URL never serves a stale code.
+    """
+    url = book_url(book_id, base_url)
+    path = _cache_path(book_id, url, cache_dir)
+    png = _read(path)
+    if png is not None:
+        return png
+
+    buf = BytesIO()
+    qrcode.make(url).save(buf, format="PNG")
+    png = buf.getvalue()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write-then-rename through a unique temp file, so concurrent sessions and
+    # workers never share or expose a half-written file
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        f.write(png)
+    os.replace(tmp_path, path)
+    return png
+
+
+def _qr_png_job(args):
+    return qr_png(*args)
+
+
+def render_qr_batch(book_ids, base_url=APP_URL, cache_dir=CACHE_DIR, workers=None):
+    """Return ``{book_id: png}``; large batches of cache misses are encoded in parallel.
+
+    The pool runs in a ``python -m labels`` child rather than in the Streamlit
+    process: spawned workers re-import ``__main__``, which there is ``app.py``.
+    The child fills the disk cache and the codes are read back from it.
+    """
+    pngs = {}
+    missing = []
+    for book_id in book_ids:
+        png = _read(_cache_path(book_id, book_url(book_id, base_url), cache_dir))
+        if png is None:
+            missing.append(book_id)
+        else:
+            pngs[book_id] = png
+
+    if len(missing) >= POOL_THRESHOLD:
+        command = [sys.executable, "-m", "labels", "--base-url", base_url, "--cache-dir", os.path.abspath(cache_dir)]
+        if workers:
+            command += ["--workers", str(workers)]
+        subprocess.run(
+            command, input="\n".join(map(str, missing)), text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+    # Reads what the child cached; anything it left out is encoded here
+    for book_id in missing:
+        pngs[book_id] = qr_png(book_id, base_url, cache_dir)
+    return {book_id: pngs[book_id] for book_id in book_ids}
+
+
+def _caption_font():
+    try:
+        return ImageFont.load_default(size=30)
+    except TypeError:
+        # Pillow < 10.1 only ships the fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+def label_pages(labels):
+    """Yield A4 sheet images for an iterable of ``(png_bytes, caption)`` pairs."""
+    cols, rows = GRID
+    cell_w = (PAGE_SIZE[0] - 2 * PAGE_MARGIN) // cols
+    cell_h = (PAGE_SIZE[1] - 2 * PAGE_MARGIN) // rows
+    qr_side = min(cell_w, cell_h - CAPTION_HEIGHT) - 20
+    font = _caption_font()
+
+    page = draw = None
+    slot = 0
+    for png, caption in labels:
+        if slot == 0:
+            page = Image.new("1", PAGE_SIZE, 1)
+            draw = ImageDraw.Draw(page)
+        x = PAGE_MARGIN + (slot % cols) * cell_w
+        y = PAGE_MARGIN + (slot // cols) * cell_h
+        code = Image.open(BytesIO(png)).convert("1").resize((qr_side, qr_side), Image.NEAREST)
+        page.paste(code, (x + (cell_w - qr_side) // 2, y))
+        if len(caption) > CAPTION_CHARS:
+            caption = caption[:CAPTION_CHARS - 1] + "…"
+        draw.text((x + cell_w // 2, y + qr_side + 10), caption, fill=0, font=font, anchor="ma")
+        slot += 1
+        if slot == cols * rows:
+            yield page
+            slot = 0
+    if slot:
+        yield page
+
+
+def label_sheets_pdf(labels):
+    """Multi-page PDF of label sheets, ready for ``st.download_button``."""
+    pages = list(label_pages(labels))
+    if not pages:
+        return b""
+    buf = BytesIO()
+    pages[0].save(buf, format="PDF", save_all=True, append_images=pages[1:], resolution=300)
+    return buf.getvalue()
+
+
+def label_sheets_zip(labels):
+    """ZIP of one PNG per A4 sheet; each page is encoded and released in turn."""
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as archive:
+        for n, page in enumerate(label_pages(labels), 1):
+            page_buf = BytesIO()
+            page.save(page_buf, format="PNG", dpi=(300, 300))
+            archive.writestr(f"labels_page_{n:03d}.png", page_buf.getvalue())
+    return buf.getvalue()
+
+
+def main(argv=None):
+    """Encode the book ids read from stdin into the cache, on a process pool."""
+    parser = argparse.ArgumentParser(description="Fill the QR code cache for book ids read from stdin")
+    parser.add_argument("--base-url", default=APP_URL)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args(argv)
+
+    jobs = [(book_id, args.base_url, args.cache_dir) for book_id in sys.stdin.read().split()]
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for _ in pool.map(_qr_png_job, jobs, chunksize=8):
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Delivery Hub ledger: filtered, keyset-paginated reads of lib_rentals."""
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+LEDGER_COLUMNS = "id, book_id, created_at, due_date, delivery_type, delivery_status, is_paid, lib_inventory(title), lib_members(full_name, phone)"
+LEDGER_PAGE_SIZE = 50
+# Columns of a ledger row that can change after it was booked
+_PATCHED_FIELDS = ("due_date", "delivery_type", "delivery_status", "is_paid")
+
+UPDATE_STATUSES = [
+    "Payment Confirmed - Awaiting Dispatch",
+    "In-Transit (Rider Dispatched)",
+    "Picked Up (Library Desk)",
+    "Returned & Completed",
+]
+# Reserved but not yet paid for; expired by the worker after the hold window
+PENDING_STATUSES = ["Pending Verification", "Awaiting Pickup"]
+# The book is with the customer; flagged overdue by the worker after due_date
+OUT_STATUSES = ["In-Transit (Rider Dispatched)", "Picked Up (Library Desk)"]
+EXPIRED_STATUS = "Expired - Unpaid"
+OVERDUE_STATUS = "Overdue - Awaiting Return"
+ALL_STATUSES = PENDING_STATUSES + UPDATE_STATUSES + [OVERDUE_STATUS, EXPIRED_STATUS]
+# Everything still needing staff attention; completed and expired history is opt-in
+ACTIVE_STATUSES = [s for s in ALL_STATUSES if s not in ("Returned & Completed", EXPIRED_STATUS)]
+
+
+def fetch_ledger_page(client, statuses=None, paid=None, date_from=None, date_to=None, cursor=None, page_size=LEDGER_PAGE_SIZE):
+    """Return ``(rows, next_cursor)`` for one page of rentals, newest first.
+
+    Filters run in the database. ``cursor`` is the ``(created_at, id)`` of the
+    last row already shown; seeking past it keeps every page as cheap as the
+    first, however long the ledger grows. ``next_cursor`` is None on the last page.
+    """
+    query = client.table("lib_rentals").select(LEDGER_COLUMNS)
+    if statuses is not None:
+        query = query.in_("delivery_status", list(statuses))
+    if paid is not None:
+        query = query.eq("is_paid", paid)
+    if date_from is not None:
+        query = query.gte("created_at", date_from.isoformat())
+    if date_to is not None:
+        query = query.lt("created_at", (date_to + timedelta(days=1)).isoformat())
+    if cursor is not None:
+        created_at, rental_id = cursor
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{rental_id})')
+
+    rows = query.order("created_at", desc=True).order("id", desc=True).limit(page_size + 1).execute().data or []
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        return rows, (last["created_at"], last["id"])
+    return rows, None
+
+
+def _matches(row, statuses=None, paid=None, date_from=None, date_to=None):
+    """The filters of ``fetch_ledger_page``, applied to one rental row."""
+    if statuses is not None and row["delivery_status"] not in statuses:
+        return False
+    if paid is not None and bool(row["is_paid"]) != paid:
+        return False
+    if date_from is not None and row["created_at"] < date_from.isoformat():
+        return False
+    if date_to is not None and row["created_at"] >= (date_to + timedelta(days=1)).isoformat():
+        return False
+    return True
+
+
+def patch_ledger_page(rows, changes, cursor=None, next_cursor=None, **filters):
+    """Fold rentals changed since a page was read into that page.
+
+    ``changes`` are ``lib_rentals`` rows from the change feed; ``cursor`` and
+    ``next_cursor`` bound the page the way ``fetch_ledger_page`` returned it.
+    Returns ``(rows, touched)``, or None when a change moves a rental into or
+    out of the page, so it has to be read again.
+    """
+    positions = {str(row["id"]): i for i, row in enumerate(rows)}
+    rows = list(rows)
+    touched = False
+    for change in changes:
+        key = (change["created_at"], str(change["id"]))
+        position = positions.get(str(change["id"]))
+        if position is None:
+            in_span = (cursor is None or key < (cursor[0], str(cursor[1]))) and (
+                next_cursor is None or key >= (next_cursor[0], str(next_cursor[1]))
+            )
+            if in_span and _matches(change, **filters):
+                return None
+            continue
+        if not _matches(change, **filters):
+            return None
+        rows[position] = {**rows[position], **{f: change[f] for f in _PATCHED_FIELDS}}
+        touched = True
+    return rows, touched
+
+
+def format_ledger(rows):
+    """Build the Delivery Hub display table with column-wise operations."""
+    raw = pd.json_normalize(rows).reindex(columns=[
+        "id", "book_id", "delivery_type", "delivery_status", "is_paid",
+        "lib_inventory.title", "lib_members.full_name", "lib_members.phone",
+    ])
+    is_member = raw["lib_members.full_name"].notna()
+    delivery_type = raw["delivery_type"].fillna("")
+    guest_name = delivery_type.str.replace("Pickup by ", "", regex=False).replace("", "Guest")
+
+    return pd.DataFrame({
+        "Ref ID": raw["id"].astype(str).str[:8],
+        "Book": raw["lib_inventory.title"].fillna("Unknown"),
+        "Customer": raw["lib_members.full_name"].where(is_member, guest_name),
+        "Contact": raw["lib_members.phone"].fillna("N/A").where(is_member, "Guest (No Phone)"),
+        "Method": np.where(delivery_type.str.contains("Home Delivery", regex=False), "🚚 Delivery", "🚶 Pickup"),
+        "Payment": np.where(raw["is_paid"].fillna(False).astype(bool), "✅ Paid", "⏳ Pending Selar"),
+        "Status": raw["delivery_status"],
+        "_raw_id": raw["id"],
+        "_book_id": raw["book_id"],
+    })
+
+
+def ledger_options(df_log):
+    """Selectbox labels for the Dispatch Desk, one per ledger row."""
+    return (df_log["Ref ID"] + " - " + df_log["Customer"] + " (" + df_log["Book"] + ")").tolist()
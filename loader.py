@@ -0,0 +1,68 @@
+"""Concurrent reads: start independent queries early, wait only for what is rendered."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = 8
+# A prefetched result older than this is dropped rather than shown
+PREFETCH_TTL = 20
+
+
+class DataLoader:
+    """Process-wide thread pool for Supabase reads.
+
+    ``submit()`` starts a read now and returns a Future, so a rerun can issue
+    all of its independent queries before rendering. ``prefetch()`` starts a
+    read that a *later* rerun is likely to need, and ``future()`` picks it up
+    under the same key, so wall-clock time tracks the slowest query, not the sum.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, prefetch_ttl=PREFETCH_TTL):
+        self.prefetch_ttl = prefetch_ttl
+        self.prefetch_hits = 0
+        self.prefetch_misses = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nova-loader")
+        self._prefetched = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        return self._pool.submit(fn, *args, **kwargs)
+
+    def _expire(self, now):
+        stale = [key for key, (started, _) in self._prefetched.items() if now - started > self.prefetch_ttl]
+        for key in stale:
+            del self._prefetched[key]
+
+    def prefetch(self, key, fn):
+        """Start ``fn()`` in the background unless a fresh prefetch for ``key`` is running."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if key not in self._prefetched:
+                self._prefetched[key] = (now, self._pool.submit(fn))
+
+    def future(self, key, fn):
+        """Return the prefetched Future for ``key`` if there is a fresh one, else start ``fn()``.
+
+        A prefetch that failed is retried rather than surfaced.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._prefetched.pop(key, None)
+            if entry is not None and not (entry[1].done() and entry[1].exception() is not None):
+                self.prefetch_hits += 1
+                return entry[1]
+            self.prefetch_misses += 1
+        return self._pool.submit(fn)
+
+    def discard(self, group):
+        """Drop prefetches whose key starts with ``group``, e.g. after a write made them stale."""
+        with self._lock:
+            for key in [k for k in self._prefetched if k[0] == group]:
+                del self._prefetched[key]
+
+    def take(self, key, fn):
+        """Blocking form of ``future()``."""
+        return self.future(key, fn).result()
+
@@ -0,0 +1,206 @@
+"""Low-overhead timings for database calls and page phases.
+
+Every Supabase call and every named phase of a rerun lands in a latency
+histogram. The structured log (JSON lines on the ``nova.perf`` logger) gets
+one INFO record per rerun, a WARNING per slow call and, at DEBUG, every call.
+``flush()`` writes the histograms as a Prometheus text file for a node
+exporter textfile collector or any scraper that can read files.
+"""
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_QUERY_SECONDS = 0.5
+FLUSH_INTERVAL = 15
+
+logger = logging.getLogger("nova.perf")
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bucket bound containing the ``q`` quantile; coarse but allocation-free."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+def _labels(**labels):
+    return ",".join(f'{name}="{str(value).replace(chr(34), chr(39))}"' for name, value in labels.items())
+
+
+def _log(level, event, **fields):
+    if logger.isEnabledFor(level):
+        logger.log(level, json.dumps({"event": event, "ts": round(time.time(), 3), **fields}, default=str))
+
+
+class Metrics:
+    """Process-wide counters and histograms; cheap enough to leave on in production."""
+
+    def __init__(self, slow_query_seconds=SLOW_QUERY_SECONDS, metrics_path=None, flush_interval=FLUSH_INTERVAL):
+        self.slow_query_seconds = slow_query_seconds
+        self.metrics_path = metrics_path
+        self.flush_interval = flush_interval
+        self._queries = {}
+        self._query_rows = {}
+        self._query_errors = {}
+        self._slow_queries = {}
+        self._phases = {}
+        self._last_flush = time.monotonic()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def begin_rerun(self, route):
+        """Start collecting the per-rerun log record for the calling script thread."""
+        self._local.trace = {"route": route, "started": time.perf_counter(), "queries": 0, "query_ms": 0.0, "phases": {}}
+
+    def end_rerun(self):
+        """Log the rerun record and flush the metrics file if it is due.
+
+        Reruns cut short by ``st.stop()`` or ``st.rerun()`` never get here; their
+        queries and phases still reach the histograms.
+        """
+        trace = getattr(self._local, "trace", None)
+        if trace is None:
+            return
+        self._local.trace = None
+        seconds = time.perf_counter() - trace.pop("started")
+        self.record_phase(f"rerun.{trace['route']}", seconds)
+        _log(logging.INFO, "rerun", ms=round(seconds * 1000, 2), **trace)
+        self.flush()
+
+    def record_query(self, table, operation, rows, seconds, error=None):
+        key = (table, operation)
+        with self._lock:
+            histogram = self._queries.get(key)
+            if histogram is None:
+                histogram = self._queries[key] = Histogram()
+            histogram.observe(seconds)
+            self._query_rows[key] = self._query_rows.get(key, 0) + rows
+            if error is not None:
+                self._query_errors[key] = self._query_errors.get(key, 0) + 1
+            slow = seconds >= self.slow_query_seconds
+            if slow:
+                self._slow_queries[key] = self._slow_queries.get(key, 0) + 1
+        trace = getattr(self._local, "trace", None)
+        if trace is not None:
+            trace["queries"] += 1
+            trace["query_ms"] = round(trace["query_ms"] + seconds * 1000, 2)
+
+        if error is not None:
+            level, event = logging.ERROR, "query_error"
+        elif slow:
+            level, event = logging.WARNING, "slow_query"
+        else:
+            level, event = logging.DEBUG, "query"
+        _log(level, event, table=table, operation=operation, rows=rows, ms=round(seconds * 1000, 2),
+             error=None if error is None else repr(error))
+
+    def record_phase(self, name, seconds):
+        with self._lock:
+            histogram = self._phases.get(name)
+            if histogram is None:
+                histogram = self._phases[name] = Histogram()
+            histogram.observe(seconds)
+        trace = getattr(self._local, "trace", None)
+        if trace is not None and not name.startswith("rerun."):
+            trace["phases"][name] = round(trace["phases"].get(name, 0.0) + seconds * 1000, 2)
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - started)
+
+    def summary(self):
+        """Per-phase and per-query count, p50/p95 bucket and mean, for on-screen display."""
+        with self._lock:
+            def rows(histograms):
+                return {
+                    key: {"count": h.count, "p50": h.quantile(0.5), "p95": h.quantile(0.95), "mean": h.total / h.count}
+                    for key, h in histograms.items() if h.count
+                }
+            return {"phases": rows(self._phases), "queries": rows(self._queries)}
+
+    def render_prometheus(self):
+        lines = []
+
+        def histogram(name, help_text, series):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, h in series:
+                cumulative = 0
+                for bound, n in zip(LATENCY_BUCKETS + (float("inf"),), h.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {h.total:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {h.count}")
+
+        def counter(name, help_text, values):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (table, operation), value in values.items():
+                lines.append(f"{name}{{{_labels(table=table, operation=operation)}}} {value}")
+
+        with self._lock:
+            histogram("nova_db_query_seconds", "Supabase call latency.",
+                      [(_labels(table=t, operation=o), h) for (t, o), h in self._queries.items()])
+            counter("nova_db_query_rows_total", "Rows returned or written by Supabase calls.", self._query_rows)
+            counter("nova_db_query_errors_total", "Supabase calls that raised.", self._query_errors)
+            counter("nova_db_slow_queries_total", "Supabase calls over the slow-query threshold.", self._slow_queries)
+            histogram("nova_phase_seconds", "Time spent in named phases of a rerun.",
+                      [(_labels(phase=name), h) for name, h in self._phases.items()])
+        return "\n".join(lines) + "\n"
+
+    def flush(self, force=False):
+        """Write the metrics file, at most once per ``flush_interval`` unless forced."""
+        if not self.metrics_path:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_flush < self.flush_interval:
+                return
+            self._last_flush = now
+        os.makedirs(os.path.dirname(self.metrics_path) or ".", exist_ok=True)
+        tmp_path = f"{self.metrics_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, self.metrics_path)
+
+
+def configure_log(path):
+    """Send ``nova.perf`` JSON lines to ``path``, or to stderr when it is None."""
+    if path:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        handler = logging.FileHandler(path)
+    else:
+        handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.handlers[:] = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
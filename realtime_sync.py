@@ -0,0 +1,180 @@
+"""Change feed: poll ``updated_at`` and apply changed rows as deltas.
+
+One background thread per server process asks each watched table for the rows
+whose ``updated_at`` moved since the last poll. Changed books go straight into
+the shared ``CatalogCache``; every changed row is kept in a short log that
+sessions replay to decide whether anything they are showing needs a rerun.
+Needs the ``updated_at`` columns and trigger from ``sql/change_feed.sql``.
+"""
+import json
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from postgrest.exceptions import APIError
+
+from catalog import CATALOG_COLUMNS
+from db import fetch_all
+
+POLL_SECONDS = 5
+POLL_PAGE_SIZE = 500
+# Changes kept for sessions to replay; a session further behind reloads instead
+LOG_SIZE = 5000
+# Re-read this far behind the watermark, so rows committed late with an older
+# ``updated_at`` are still picked up. Rows already seen are skipped.
+OVERLAP = timedelta(seconds=2)
+
+WATCHED_COLUMNS = {
+    "lib_inventory": f"{CATALOG_COLUMNS}, updated_at",
+    "lib_rentals": "id, book_id, member_id, created_at, due_date, delivery_type, delivery_status, is_paid, updated_at",
+}
+
+logger = logging.getLogger("nova.sync")
+
+# Feeds with a polling thread, so stop_feeds() can end them when caches are cleared
+_running = weakref.WeakSet()
+
+
+def _parse(timestamp):
+    return datetime.fromisoformat(timestamp)
+
+
+class ChangeFeed:
+    """Shared, polling change feed over ``lib_inventory`` and ``lib_rentals``.
+
+    Every poll that finds changes bumps ``version``. ``changes_since(version)``
+    returns the rows changed after it, so a session only looks at the delta.
+    If the ``updated_at`` column is missing the feed turns itself off and the
+    app falls back to the catalog TTL.
+    """
+
+    def __init__(self, client, catalog_cache, poll_seconds=POLL_SECONDS, page_size=POLL_PAGE_SIZE, log_size=LOG_SIZE):
+        self.client = client
+        self.catalog_cache = catalog_cache
+        self.poll_seconds = poll_seconds
+        self.page_size = page_size
+        self.version = 0
+        self.available = True
+        self.polls = 0
+        self.rows_applied = 0
+        self.last_error = None
+        started = datetime.now(timezone.utc) - OVERLAP
+        self._watermarks = {table: started for table in WATCHED_COLUMNS}
+        self._seen = {table: {} for table in WATCHED_COLUMNS}
+        self._log = deque(maxlen=log_size)
+        # Changes up to this version may have been evicted from the log
+        self._log_floor = 0
+        self._lock = threading.Lock()
+        self._listeners = {table: [] for table in WATCHED_COLUMNS}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, table, listener):
+        """Call ``listener(rows)`` with the changed rows of ``table`` after each poll."""
+        self._listeners[table].append(listener)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="nova-change-feed", daemon=True)
+            self._thread.start()
+            _running.add(self)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        _running.discard(self)
+
+    def _run(self):
+        while self.available and not self._stop.wait(self.poll_seconds):
+            try:
+                self.poll()
+            except Exception as e:
+                # Keep polling; the catalog TTL covers for a feed that is down
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.warning(json.dumps({"event": "change_feed_error", "ts": round(time.time(), 3), "error": self.last_error}))
+
+    def _fetch(self, table):
+        since = (self._watermarks[table] - OVERLAP).isoformat()
+        # Ordered by updated_at, not id; a poll only reads the last few seconds of changes
+        return fetch_all(
+            lambda: self.client.table(table).select(WATCHED_COLUMNS[table]).gte("updated_at", since).order("updated_at").order("id"),
+            self.page_size,
+            keyset=False,
+        )
+
+    def _new_rows(self, table, rows):
+        """Drop rows already applied, advance the watermark and forget rows behind it."""
+        seen = self._seen[table]
+        fresh = [row for row in rows if seen.get(row["id"]) != row["updated_at"]]
+        for row in fresh:
+            seen[row["id"]] = row["updated_at"]
+            self._watermarks[table] = max(self._watermarks[table], _parse(row["updated_at"]))
+        horizon = self._watermarks[table] - OVERLAP
+        for row_id in [i for i, stamp in seen.items() if _parse(stamp) < horizon]:
+            del seen[row_id]
+        return fresh
+
+    def poll(self):
+        """Fetch and apply one round of changes; returns the number of changed rows."""
+        try:
+            fetched = {table: self._fetch(table) for table in WATCHED_COLUMNS}
+        except APIError as e:
+            if e.code == "42703":
+                # undefined_column: sql/change_feed.sql has not been run
+                self.available = False
+            raise
+        changed = {table: self._new_rows(table, rows) for table, rows in fetched.items()}
+        self.polls += 1
+        # Each poll covered the changes since the last one; deletes and rows that
+        # slipped behind the overlap wait for the cache's max_age reload
+        self.catalog_cache.mark_fresh()
+        count = sum(len(rows) for rows in changed.values())
+        if not count:
+            return 0
+        if changed["lib_inventory"]:
+            self.catalog_cache.upsert(changed["lib_inventory"])
+        for table, rows in changed.items():
+            if rows:
+                for listener in self._listeners[table]:
+                    listener(rows)
+        with self._lock:
+            self.version += 1
+            for table, rows in changed.items():
+                for row in rows:
+                    if len(self._log) == self._log.maxlen:
+                        self._log_floor = self._log[0][0]
+                    self._log.append((self.version, table, row))
+            self.rows_applied += count
+        return count
+
+    def changes_since(self, version, table):
+        """Rows of ``table`` changed after ``version``, oldest first.
+
+        Returns None when the log no longer reaches back that far; the caller
+        should reload rather than patch.
+        """
+        with self._lock:
+            if version >= self.version:
+                return []
+            if version < self._log_floor:
+                return None
+            return [row for v, t, row in self._log if v > version and t == table]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "available": self.available,
+                "version": self.version,
+                "polls": self.polls,
+                "rows_applied": self.rows_applied,
+                "last_error": self.last_error,
+            }
+
+
+def stop_feeds():
+    """Stop every started feed, e.g. before ``st.cache_resource.clear()`` drops them."""
+    for feed in list(_running):
+        feed.stop()
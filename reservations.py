@@ -0,0 +1,33 @@
+"""Compare-and-set primitives for claiming inventory without a global lock."""
+
+
+def claim_books(client, book_ids):
+    """Flip ``book_ids`` from Available to Reserved and return the ids this call won.
+
+    The status filter makes the update conditional, so when two shoppers race
+    for the same copy the database lets exactly one of them through.
+    """
+    if not book_ids:
+        return []
+    res = (
+        client.table("lib_inventory")
+        .update({"status": "Reserved"})
+        .in_("id", list(book_ids))
+        .eq("status", "Available")
+        .execute()
+    )
+    return [row['id'] for row in res.data or []]
+
+
+def release_books(client, book_ids):
+    """Undo a claim, touching only books that are still Reserved."""
+    if not book_ids:
+        return []
+    res = (
+        client.table("lib_inventory")
+        .update({"status": "Available"})
+        .in_("id", list(book_ids))
+        .eq("status", "Reserved")
+        .execute()
+    )
+    return [row['id'] for row in res.data or []]
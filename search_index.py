@@ -0,0 +1,187 @@
+"""In-memory title/author search index for the Collection gallery."""
+import bisect
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+# A title hit outranks an author hit, and an exact word outranks a prefix or typo.
+FIELD_WEIGHTS = {"title": 2.0, "author": 1.0}
+EXACT_SCORE = 3.0
+PREFIX_SCORE = 2.0
+FUZZY_SCORE = 1.0
+MIN_FUZZY_SIMILARITY = 0.45
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text):
+    """Lower-case, strip accents and punctuation so "Éclair," matches "eclair"."""
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def tokenize(text):
+    return normalize(text).split()
+
+
+def trigrams(token):
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _within_edits(a, b, limit):
+    """True if ``a`` and ``b`` are at most ``limit`` insertions/deletions/substitutions apart."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+class SearchIndex:
+    """Token and trigram inverted index over book titles and authors.
+
+    Built once per catalog version and kept current through ``apply()``, which
+    is registered as a ``CatalogCache`` listener. Lookups touch only the
+    postings of the query words, so latency does not grow with catalog size.
+    """
+
+    def __init__(self):
+        self.version = -1
+        self._docs = {}
+        self._postings = defaultdict(dict)
+        self._vocab = []
+        self._token_trigrams = defaultdict(set)
+        self._genres = defaultdict(dict)
+        self._lock = threading.RLock()
+
+    def build(self, rows, version):
+        with self._lock:
+            self._docs.clear()
+            self._postings.clear()
+            self._vocab = []
+            self._token_trigrams.clear()
+            self._genres.clear()
+            for row in rows:
+                self._add(row)
+            self.version = version
+
+    def apply(self, event, rows, version):
+        """``CatalogCache`` listener: rebuild on reload, patch on row changes."""
+        if event == "reset":
+            self.build(rows, version)
+            return
+        with self._lock:
+            for row in rows:
+                self._remove(row["id"])
+                self._add(row)
+            self.version = version
+
+    def _add(self, row):
+        book_id = row["id"]
+        weights = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(row.get(field)):
+                weights[token] = max(weights.get(token, 0.0), weight)
+        for token, weight in weights.items():
+            if token not in self._postings:
+                bisect.insort(self._vocab, token)
+                for gram in trigrams(token):
+                    self._token_trigrams[gram].add(token)
+            self._postings[token][book_id] = weight
+        genre = row.get("genre")
+        self._genres[genre][book_id] = None
+        self._docs[book_id] = (tuple(weights), genre)
+
+    def _remove(self, book_id):
+        doc = self._docs.pop(book_id, None)
+        if doc is None:
+            return
+        tokens, genre = doc
+        for token in tokens:
+            postings = self._postings[token]
+            postings.pop(book_id, None)
+            if not postings:
+                del self._postings[token]
+                del self._vocab[bisect.bisect_left(self._vocab, token)]
+                for gram in trigrams(token):
+                    self._token_trigrams[gram].discard(token)
+        members = self._genres.get(genre)
+        if members is not None:
+            members.pop(book_id, None)
+            if not members:
+                del self._genres[genre]
+
+    def _expand(self, term):
+        """Map a query word to ``{indexed_token: score}`` for exact, prefix and typo matches."""
+        matches = {}
+        if term in self._postings:
+            matches[term] = EXACT_SCORE
+        start = bisect.bisect_left(self._vocab, term)
+        for token in self._vocab[start:]:
+            if not token.startswith(term):
+                break
+            matches.setdefault(token, PREFIX_SCORE)
+        if len(term) >= 3:
+            query_grams = trigrams(term)
+            shared = defaultdict(int)
+            for gram in query_grams:
+                for token in self._token_trigrams.get(gram, ()):
+                    shared[token] += 1
+            limit = 1 if len(term) <= 5 else 2
+            # q-gram lemma: a word within ``limit`` edits shares at least this many trigrams
+            min_shared = max(1, len(query_grams) - 3 * limit)
+            for token, count in shared.items():
+                if token in matches or count < min_shared:
+                    continue
+                similarity = count / len(query_grams | trigrams(token))
+                if similarity >= MIN_FUZZY_SIMILARITY or _within_edits(term, token, limit):
+                    matches[token] = FUZZY_SCORE * max(similarity, 0.5)
+        return matches
+
+    def search(self, query, genre=None, limit=None):
+        """Return book ids ranked by relevance; every query word must match.
+
+        An empty query returns the books in ``genre`` in catalog order.
+        """
+        terms = tokenize(query)
+        with self._lock:
+            if genre is not None:
+                allowed = self._genres.get(genre, {})
+            else:
+                allowed = None
+            if not terms:
+                ids = list(allowed if allowed is not None else self._docs)
+                return ids[:limit] if limit else ids
+
+            scores = None
+            for term in terms:
+                term_scores = {}
+                for token, score in self._expand(term).items():
+                    for book_id, weight in self._postings.get(token, {}).items():
+                        if allowed is not None and book_id not in allowed:
+                            continue
+                        hit = score * weight
+                        if hit > term_scores.get(book_id, 0.0):
+                            term_scores[book_id] = hit
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {book_id: scores[book_id] + hit for book_id, hit in term_scores.items() if book_id in scores}
+                if not scores:
+                    return []
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        return ranked[:limit] if limit else ranked
+
+    def genre_counts(self):
+        """Genre facet: number of indexed books per genre."""
+        with self._lock:
+            return {genre: len(ids) for genre, ids in self._genres.items()}
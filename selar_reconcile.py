@@ -0,0 +1,214 @@
+"""Match a Selar transaction export to pending rentals and confirm them in bulk."""
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from bulk_import import iter_upload
+from db import fetch_all
+from ledger import PENDING_STATUSES
+from search_index import normalize
+
+CONFIRMED_STATUS = "Payment Confirmed - Awaiting Dispatch"
+PENDING_COLUMNS = "id, book_id, created_at, delivery_type, delivery_status, lib_members(email, full_name)"
+PENDING_PAGE_SIZE = 1000
+# ``in_()`` filters travel in the URL; this many uuids stays well under proxy limits
+CONFIRM_BATCH_SIZE = 200
+
+# A payment must land within this long after its checkout
+PAYMENT_WINDOW = timedelta(hours=48)
+# Tolerated clock difference between Selar and the database
+CLOCK_SLACK = timedelta(minutes=10)
+# Selar exports local (West Africa) time without an offset
+SELAR_TIMEZONE = timezone(timedelta(hours=1))
+
+COLUMN_ALIASES = {
+    "email": "email", "customer email": "email", "buyer email": "email", "email address": "email",
+    "name": "name", "customer name": "name", "buyer name": "name", "customer": "name", "full name": "name",
+    "amount": "amount", "amount paid": "amount", "total": "amount", "price": "amount",
+    "date": "paid_at", "paid at": "paid_at", "created at": "paid_at", "transaction date": "paid_at", "payment date": "paid_at",
+    "reference": "reference", "transaction id": "reference", "transaction reference": "reference", "order id": "reference",
+    "status": "status", "payment status": "status",
+}
+_PAID = {"", "success", "successful", "paid", "completed", "complete"}
+_DATE_FORMATS = ("%d/%m/%Y %H:%M", "%d/%m/%Y %H:%M:%S", "%d/%m/%Y", "%b %d, %Y %I:%M %p", "%d %b %Y, %I:%M %p", "%d %b %Y")
+_NOT_AMOUNT = re.compile(r"[^0-9.]")
+
+
+def _parse_time(value):
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = " ".join(str(value or "").split())
+        try:
+            parsed = datetime.fromisoformat(text)
+        except ValueError:
+            for fmt in _DATE_FORMATS:
+                try:
+                    parsed = datetime.strptime(text, fmt)
+                    break
+                except ValueError:
+                    continue
+            else:
+                return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=SELAR_TIMEZONE)
+
+
+def _parse_amount(value):
+    try:
+        return float(_NOT_AMOUNT.sub("", str(value).replace("NGN", "")))
+    except ValueError:
+        return None
+
+
+def read_payments(file, filename):
+    """Parse a Selar export into payment dicts; returns ``(payments, errors)``."""
+    payments, errors = [], []
+    for row_no, raw, _ in iter_upload(file, filename, aliases=COLUMN_ALIASES):
+        if normalize(raw.get("status")) not in _PAID:
+            continue
+        paid_at = _parse_time(raw.get("paid_at"))
+        amount = _parse_amount(raw.get("amount"))
+        email = str(raw.get("email") or "").strip().lower()
+        name = " ".join(str(raw.get("name") or "").split())
+        if paid_at is None or amount is None or not (email or name):
+            errors.append({"Row": row_no, "Error": "Needs a date, an amount and an email or name", **{k: str(v) for k, v in raw.items()}})
+            continue
+        payments.append({
+            "row": row_no,
+            "reference": str(raw.get("reference") or f"row {row_no}"),
+            "email": email,
+            "name": name,
+            "amount": amount,
+            "paid_at": paid_at,
+        })
+    return payments, errors
+
+
+def fetch_pending(client, page_size=PENDING_PAGE_SIZE):
+    """Every unpaid rental still waiting for payment, in id-keyset pages."""
+    return fetch_all(
+        lambda: client.table("lib_rentals").select(PENDING_COLUMNS).eq("is_paid", False).in_("delivery_status", PENDING_STATUSES),
+        page_size,
+    )
+
+
+def _checkouts(rentals, price):
+    """Group rentals booked by one checkout and index them by email and by name.
+
+    A checkout inserts all of its rentals in one statement, so they share
+    ``created_at`` as well as the customer.
+    """
+    groups = defaultdict(list)
+    names = {}
+    for rental in rentals:
+        member = rental.get("lib_members") or {}
+        delivery_type = rental.get("delivery_type") or ""
+        guest = delivery_type[len("Pickup by "):] if delivery_type.startswith("Pickup by ") else ""
+        customer = (str(member.get("email") or "").lower(), normalize(member.get("full_name") or guest))
+        groups[(customer, rental["created_at"])].append(rental)
+        names[customer] = member.get("full_name") or guest
+
+    by_email, by_name = defaultdict(list), defaultdict(list)
+    for ((email, name), created_at), group in groups.items():
+        checkout = {
+            "key": ((email, name), created_at),
+            "customer": names[(email, name)],
+            "booked_at": datetime.fromisoformat(created_at),
+            "amount": sum(price(r) for r in group),
+            "rental_ids": [r["id"] for r in group],
+        }
+        if email:
+            by_email[email].append(checkout)
+        if name:
+            by_name[name].append(checkout)
+    return by_email, by_name
+
+
+def _preview(payment, checkout=None, reason=None):
+    row = {
+        "Reference": payment["reference"],
+        "Paid By": payment["email"] or payment["name"],
+        "Amount": payment["amount"],
+        "Paid At": payment["paid_at"].astimezone(SELAR_TIMEZONE).strftime("%Y-%m-%d %H:%M"),
+    }
+    if checkout is not None:
+        row.update({"Customer": checkout["customer"], "Booked At": checkout["booked_at"].astimezone(SELAR_TIMEZONE).strftime("%Y-%m-%d %H:%M"), "Rentals": len(checkout["rental_ids"])})
+    if reason is not None:
+        row["Reason"] = reason
+    return row
+
+
+class Reconciliation:
+    """Outcome of matching payments to checkouts, for preview before applying."""
+
+    def __init__(self):
+        self.matched = []
+        self.ambiguous = []
+        self.unmatched = []
+        self.rental_ids = []
+
+
+def match_payments(payments, rentals, price, window=PAYMENT_WINDOW):
+    """Pair each payment with exactly one pending checkout.
+
+    A candidate checkout belongs to the payer (email first, then name), costs
+    exactly the amount paid, and was booked no more than ``window`` before the
+    payment. Lookups are hash-indexed, so the cost is linear in payments plus
+    rentals. Payments with several candidates, or competing for the same
+    checkout, are left for staff to decide.
+    """
+    by_email, by_name = _checkouts(rentals, price)
+    result = Reconciliation()
+    candidates = []
+    for payment in payments:
+        customer = by_email.get(payment["email"]) if payment["email"] else None
+        if not customer:
+            customer = by_name.get(normalize(payment["name"]), [])
+        in_window = [
+            c for c in customer
+            if c["booked_at"] - CLOCK_SLACK <= payment["paid_at"] <= c["booked_at"] + window
+        ]
+        fits = [c for c in in_window if abs(c["amount"] - payment["amount"]) < 0.01]
+        if not customer:
+            result.unmatched.append(_preview(payment, reason="No pending rental for this email or name"))
+        elif not in_window:
+            result.unmatched.append(_preview(payment, reason="No checkout booked in the payment window"))
+        elif not fits:
+            expected = ", ".join(f"₦{c['amount']:,.0f}" for c in in_window)
+            result.unmatched.append(_preview(payment, reason=f"Amount does not match a checkout ({expected})"))
+        elif len(fits) > 1:
+            result.ambiguous.append(_preview(payment, reason=f"{len(fits)} checkouts of this amount"))
+        else:
+            candidates.append((payment, fits[0]))
+
+    claims = defaultdict(int)
+    for _, checkout in candidates:
+        claims[checkout["key"]] += 1
+    for payment, checkout in candidates:
+        if claims[checkout["key"]] > 1:
+            result.ambiguous.append(_preview(payment, checkout, reason="Several payments match this checkout"))
+        else:
+            result.matched.append(_preview(payment, checkout))
+            result.rental_ids.extend(checkout["rental_ids"])
+    return result
+
+
+def confirm_payments(client, rental_ids, batch_size=CONFIRM_BATCH_SIZE):
+    """Mark rentals paid and ready for dispatch; returns the updated rows.
+
+    The update only touches rentals that are still unpaid and pending, so one
+    confirmed or expired since the preview is left as it is.
+    """
+    updated = []
+    rental_ids = list(rental_ids)
+    for start in range(0, len(rental_ids), batch_size):
+        res = (
+            client.table("lib_rentals")
+            .update({"is_paid": True, "delivery_status": CONFIRMED_STATUS})
+            .in_("id", rental_ids[start:start + batch_size])
+            .eq("is_paid", False)
+            .in_("delivery_status", PENDING_STATUSES)
+            .execute()
+        )
+        updated.extend(res.data or [])
+    return updated
@@ -0,0 +1,27 @@
+-- Row change timestamps for the app's change feed (see realtime_sync.ChangeFeed),
+-- which polls each table for rows whose updated_at moved since its last poll.
+create or replace function public.set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+alter table public.lib_inventory add column if not exists updated_at timestamptz not null default now();
+alter table public.lib_rentals add column if not exists updated_at timestamptz not null default now();
+
+drop trigger if exists lib_inventory_updated_at on public.lib_inventory;
+create trigger lib_inventory_updated_at
+    before update on public.lib_inventory
+    for each row execute function public.set_updated_at();
+
+drop trigger if exists lib_rentals_updated_at on public.lib_rentals;
+create trigger lib_rentals_updated_at
+    before update on public.lib_rentals
+    for each row execute function public.set_updated_at();
+
+create index if not exists lib_inventory_updated_idx on public.lib_inventory (updated_at, id);
+create index if not exists lib_rentals_updated_idx on public.lib_rentals (updated_at, id);
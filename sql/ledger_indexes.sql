@@ -0,0 +1,7 @@
+-- Supports the Delivery Hub's status filter plus newest-first keyset pagination
+-- (see ledger.fetch_ledger_page), so each page is an index range scan.
+create index if not exists lib_rentals_status_created_idx
+    on public.lib_rentals (delivery_status, created_at desc, id desc);
+
+create index if not exists lib_rentals_created_idx
+    on public.lib_rentals (created_at desc, id desc);
@@ -0,0 +1,55 @@
+-- Atomic checkout: claim every book of a cart with a conditional
+-- Available -> Reserved update and insert rentals for the books won, in one
+-- transaction. Concurrent checkouts for the same copy are serialized by the row
+-- lock, so only one of them sees status = 'Available'.
+-- With all_or_nothing, any conflict releases the claimed books and inserts nothing.
+-- Called from checkout.reserve_books() as
+--   supabase.rpc("reserve_books", {"rentals": [...], "all_or_nothing": true}).
+-- Returns {"rentals": [inserted rows], "conflicts": [book ids not reserved]}.
+drop function if exists public.reserve_books(jsonb);
+
+create or replace function public.reserve_books(rentals jsonb, all_or_nothing boolean default true)
+returns jsonb
+language plpgsql
+as $$
+declare
+    claimed jsonb;
+    conflicts jsonb;
+    inserted jsonb;
+begin
+    with won as (
+        update public.lib_inventory i
+        set status = 'Reserved'
+        from jsonb_populate_recordset(null::public.lib_rentals, rentals) r
+        where i.id = r.book_id and i.status = 'Available'
+        returning i.id
+    )
+    select coalesce(jsonb_agg(id), '[]'::jsonb) into claimed from won;
+
+    select coalesce(jsonb_agg(r.book_id), '[]'::jsonb) into conflicts
+    from jsonb_populate_recordset(null::public.lib_rentals, rentals) r
+    where not claimed @> to_jsonb(r.book_id);
+
+    if jsonb_array_length(claimed) = 0
+       or (all_or_nothing and jsonb_array_length(conflicts) > 0) then
+        update public.lib_inventory
+        set status = 'Available'
+        where id in (
+            select r.book_id from jsonb_populate_recordset(null::public.lib_rentals, rentals) r
+            where claimed @> to_jsonb(r.book_id)
+        );
+        return jsonb_build_object('rentals', '[]'::jsonb, 'conflicts', conflicts);
+    end if;
+
+    with ins as (
+        insert into public.lib_rentals (book_id, member_id, due_date, delivery_type, delivery_status, is_paid)
+        select r.book_id, r.member_id, r.due_date, r.delivery_type, r.delivery_status, r.is_paid
+        from jsonb_populate_recordset(null::public.lib_rentals, rentals) r
+        where claimed @> to_jsonb(r.book_id)
+        returning *
+    )
+    select coalesce(jsonb_agg(to_jsonb(ins)), '[]'::jsonb) into inserted from ins;
+
+    return jsonb_build_object('rentals', inserted, 'conflicts', conflicts);
+end;
+$$;
@@ -0,0 +1,21 @@
+-- Run summaries written by worker.py, one row per sweep.
+create table if not exists public.lib_worker_runs (
+    id bigint generated always as identity primary key,
+    started_at timestamptz not null,
+    finished_at timestamptz,
+    expired integer not null default 0,
+    released integer not null default 0,
+    overdue integer not null default 0,
+    batches integer not null default 0,
+    error text
+);
+
+-- The worker's two sweeps (see worker.expire_unpaid and worker.flag_overdue)
+-- only touch open rentals, so partial indexes stay small as history grows.
+create index if not exists lib_rentals_unpaid_created_idx
+    on public.lib_rentals (created_at)
+    where not is_paid and delivery_status in ('Pending Verification', 'Awaiting Pickup');
+
+create index if not exists lib_rentals_out_due_idx
+    on public.lib_rentals (due_date)
+    where delivery_status in ('In-Transit (Rider Dispatched)', 'Picked Up (Library Desk)');
@@ -0,0 +1,190 @@
+"""Scheduled reconciliation of rentals and inventory, run outside Streamlit.
+
+Expires reservations nobody paid for within the hold window, puts their books
+back on the shelf and flags rentals past their ``due_date``. Every sweep is a
+handful of set-based statements per batch, so it costs the same whether one
+rental or a thousand need attention.
+
+    python -m worker --once          # one sweep, e.g. from cron
+    python -m worker --interval 15   # sweep every 15 minutes until stopped
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+import tomllib
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+
+from db import MAX_RETRIES, REQUEST_TIMEOUT, get_database
+from ledger import EXPIRED_STATUS, OUT_STATUSES, OVERDUE_STATUS, PENDING_STATUSES
+from reservations import release_books
+
+SECRETS_PATH = ".streamlit/secrets.toml"
+HOLD_HOURS = 24
+INTERVAL_MINUTES = 15
+BATCH_SIZE = 200
+
+logger = logging.getLogger("nova.worker")
+
+
+@dataclass
+class SweepResult:
+    """Run summary, stored as one ``lib_worker_runs`` row."""
+    started_at: str
+    finished_at: str = None
+    expired: int = 0
+    released: int = 0
+    overdue: int = 0
+    batches: int = 0
+    error: str = None
+
+
+def _log(level, event, **fields):
+    logger.log(level, json.dumps({"event": event, "ts": round(time.time(), 3), **fields}, default=str))
+
+
+def _sweep(select, update, batch_size, on_batch):
+    """Read ids matching ``select`` a batch at a time and rewrite them with ``update``.
+
+    ``update(ids)`` repeats the selection filters, so a rental staff changed in
+    between is left alone. Updated rows drop out of the selection, so every
+    batch reads the first page again.
+    """
+    while True:
+        page = select().limit(batch_size).execute().data or []
+        if not page:
+            return
+        changed = update([r['id'] for r in page]).execute().data or []
+        on_batch(changed)
+        if not changed or len(page) < batch_size:
+            return
+
+
+def expire_unpaid(client, result, cutoff, batch_size=BATCH_SIZE):
+    """Expire unpaid rentals booked before ``cutoff`` and release their Reserved books.
+
+    Rentals are expired before their books are released, so a crash in between
+    leaves a book Reserved rather than lent to two customers.
+    """
+    def select():
+        return (
+            client.table("lib_rentals")
+            .select("id")
+            .in_("delivery_status", PENDING_STATUSES)
+            .eq("is_paid", False)
+            .lt("created_at", cutoff.isoformat())
+            .order("created_at")
+        )
+
+    def update(ids):
+        return (
+            client.table("lib_rentals")
+            .update({"delivery_status": EXPIRED_STATUS})
+            .in_("id", ids)
+            .in_("delivery_status", PENDING_STATUSES)
+            .eq("is_paid", False)
+        )
+
+    def on_batch(rentals):
+        result.batches += 1
+        result.expired += len(rentals)
+        result.released += len(release_books(client, {r['book_id'] for r in rentals}))
+
+    _sweep(select, update, batch_size, on_batch)
+
+
+def flag_overdue(client, result, today, batch_size=BATCH_SIZE):
+    """Move rentals still out with the customer after ``due_date`` to the overdue status."""
+    def select():
+        return (
+            client.table("lib_rentals")
+            .select("id")
+            .in_("delivery_status", OUT_STATUSES)
+            .lt("due_date", today.isoformat())
+            .order("due_date")
+        )
+
+    def update(ids):
+        return (
+            client.table("lib_rentals")
+            .update({"delivery_status": OVERDUE_STATUS})
+            .in_("id", ids)
+            .in_("delivery_status", OUT_STATUSES)
+        )
+
+    def on_batch(rentals):
+        result.batches += 1
+        result.overdue += len(rentals)
+
+    _sweep(select, update, batch_size, on_batch)
+
+
+def record_run(client, result):
+    """Store the summary; the sweep itself has already been applied if this fails.
+
+    Any failure, including a connection error after the retries, is logged and
+    swallowed so ``--interval`` keeps sweeping.
+    """
+    try:
+        client.table("lib_worker_runs").insert(asdict(result)).execute()
+    except Exception as e:
+        _log(logging.WARNING, "worker_run_not_recorded", error=f"{type(e).__name__}: {e}")
+
+
+def run_once(client, hold_hours=HOLD_HOURS, batch_size=BATCH_SIZE):
+    """One sweep: expire stale reservations, flag overdue rentals, record the run."""
+    now = datetime.now(timezone.utc)
+    result = SweepResult(started_at=now.isoformat())
+    started = time.perf_counter()
+    try:
+        expire_unpaid(client, result, now - timedelta(hours=hold_hours), batch_size)
+        flag_overdue(client, result, now.date(), batch_size)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.finished_at = datetime.now(timezone.utc).isoformat()
+    _log(
+        logging.ERROR if result.error else logging.INFO, "worker_run",
+        ms=round((time.perf_counter() - started) * 1000, 1), **asdict(result),
+    )
+    record_run(client, result)
+    return result
+
+
+def load_secrets(path=SECRETS_PATH):
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--secrets", default=SECRETS_PATH, help="Streamlit secrets file with the [supabase] credentials")
+    parser.add_argument("--once", action="store_true", help="run one sweep and exit")
+    parser.add_argument("--interval", type=float, help="minutes between sweeps")
+    parser.add_argument("--hold-hours", type=float, help="how long an unpaid reservation holds its books")
+    parser.add_argument("--batch-size", type=int, help="rentals rewritten per statement")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    secrets = load_secrets(args.secrets)
+    config = secrets.get("worker", {})
+    interval = args.interval or config.get("interval_minutes", INTERVAL_MINUTES)
+    hold_hours = args.hold_hours or config.get("hold_hours", HOLD_HOURS)
+    batch_size = args.batch_size or config.get("batch_size", BATCH_SIZE)
+    client = get_database(
+        secrets["supabase"]["url"],
+        secrets["supabase"]["key"],
+        timeout=secrets["supabase"].get("timeout", REQUEST_TIMEOUT),
+        retries=secrets["supabase"].get("retries", MAX_RETRIES),
+    )
+
+    while True:
+        result = run_once(client, hold_hours, batch_size)
+        if args.once:
+            return 1 if result.error else 0
+        time.sleep(interval * 60)
+
+
+if __name__ == "__main__":
+    sys.exit(main())